@@ -0,0 +1,244 @@
+"""
+Sentetik verilerle performans ölçümleri.
+
+Kullanım:
+    python benchmark.py returns [--symbols 600] [--years 3]
+    python benchmark.py breadth [--indices 45] [--symbols 600]
+    python benchmark.py pipeline [--latency-ms 20] [--failure-rate 0.01] [--max-seconds 60]
+    python benchmark.py import [--max-seconds 0.5]
+
+pipeline, tam günlük güncellemeyi (data_fetcher.main) gerçek INDICES ve üyelik
+evreni üzerinde sahte Supabase ve sentetik fiyatlarla çalıştırır; süre, uç nokta
+başına çağrı sayısı ve en yüksek bellek kullanımını raporlar.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fake_backends import FakeSupabase, SyntheticQuotes, seed_history
+from index_analytics import compute_index_breadth
+from membership import Membership
+from return_engine import compute_returns
+
+
+def synthetic_closes(n_symbols, years, missing_ratio=0.02, seed=42):
+    """
+    Rastgele yürüyüşle (tarih x sembol) kapanış matrisi üretir.
+    missing_ratio kadar hücre NaN bırakılır (işlem görmeyen günler).
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=datetime.now().date(), periods=int(years * 252))
+    steps = rng.normal(0, 0.02, size=(len(dates), n_symbols))
+    values = 100 * np.exp(np.cumsum(steps, axis=0))
+    values[rng.random(values.shape) < missing_ratio] = np.nan
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    return pd.DataFrame(values, index=dates, columns=symbols)
+
+
+def per_symbol_returns(closes, current, ref_dates):
+    """
+    Eski yaklaşımın karşılığı: her sembol ve her ufuk için tek tek referans arar.
+    """
+    rows = {}
+    for sym in current.index:
+        series = closes[sym]
+        row = {}
+        for horizon, ref_date in ref_dates.items():
+            history = series.loc[:pd.Timestamp(ref_date)].dropna()
+            ref = float(history.iloc[-1]) if not history.empty else None
+            row[horizon] = round((current[sym] - ref) / ref * 100, 2) if ref else np.nan
+        rows[sym] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def bench_returns(args):
+    closes = synthetic_closes(args.symbols, args.years)
+    history, current = closes.iloc[:-1], closes.iloc[-1].fillna(closes.iloc[-2])
+    today = closes.index[-1]
+    ref_dates = {
+        '1d': closes.index[-2],
+        '1w': today - pd.Timedelta(weeks=1),
+        '2w': today - pd.Timedelta(weeks=2),
+        '3w': today - pd.Timedelta(weeks=3),
+        '1m': today - pd.DateOffset(months=1),
+        '3m': today - pd.DateOffset(months=3),
+    }
+    print(f"Matrix: {len(closes)} dates x {args.symbols} symbols, {len(ref_dates)} horizons")
+
+    start = time.perf_counter()
+    vectorized = compute_returns(history, current, ref_dates)
+    t_vec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = per_symbol_returns(history, current, ref_dates)
+    t_scalar = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(vectorized, scalar[vectorized.columns], check_names=False)
+    print(f"vectorized: {t_vec * 1000:8.1f} ms")
+    print(f"per-symbol: {t_scalar * 1000:8.1f} ms  ({t_scalar / t_vec:.0f}x slower)")
+
+
+def synthetic_membership(n_indices, n_symbols, seed=42):
+    """
+    Her endekse 10 ile n_symbols/2 arası rastgele üye atanmış üyelik matrisi.
+    """
+    rng = np.random.default_rng(seed)
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    constituents = {}
+    for i in range(n_indices):
+        size = int(rng.integers(10, max(11, n_symbols // 2)))
+        constituents[f"X{i:04d}"] = [str(s) for s in rng.choice(symbols, size=size, replace=False)]
+    return Membership(constituents)
+
+
+def bench_breadth(args):
+    membership = synthetic_membership(args.indices, args.symbols)
+    closes = synthetic_closes(len(membership.symbols), 1 / 12)
+    history, current = closes.iloc[:-1].to_numpy(), closes.iloc[-1].to_numpy()
+    returns = (current / closes.iloc[-2].to_numpy() - 1) * 100
+    print(f"Membership: {len(membership.indices)} indices x {len(membership.symbols)} stocks, "
+          f"{len(history)} sessions of history")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        breadth = compute_index_breadth(membership, returns, current, history)
+        timings.append(time.perf_counter() - start)
+
+    print(f"breadth: {len(breadth)} indices, best {min(timings) * 1000:.1f} ms, "
+          f"worst {max(timings) * 1000:.1f} ms over {args.repeat} runs")
+    if max(timings) >= 1.0:
+        raise SystemExit("breadth analytics exceeded the 1 second budget")
+
+
+def bench_pipeline(args):
+    import data_fetcher
+
+    quotes = SyntheticQuotes(latency=args.latency_ms / 1000, failure_rate=args.failure_rate,
+                             missing_rate=args.missing_rate)
+    db = FakeSupabase(latency=args.db_latency_ms / 1000, failure_rate=args.failure_rate)
+    membership = data_fetcher.load_membership()
+    seeded = seed_history(db, quotes, 'bist_index_history', data_fetcher.INDICES.keys(), args.history_days)
+    seeded += seed_history(db, quotes, 'bist_price_history', membership.symbols, args.history_days)
+    print(f"Universe: {len(data_fetcher.INDICES)} indices, {len(membership.symbols)} stocks, "
+          f"{seeded} seeded history rows")
+
+    data_fetcher.set_backends(client=db, quotes=quotes)
+    store_dir_before = data_fetcher.PRICE_STORE_DIR
+    with tempfile.TemporaryDirectory() as store_dir:
+        data_fetcher.PRICE_STORE_DIR = store_dir
+        report_path = os.path.join(store_dir, 'run_report.json')
+        argv = ['--workers', str(args.workers), '--rate', '0', '--report', report_path, '--prometheus', '',
+                '--journal', os.path.join(store_dir, 'run_journal.jsonl'), '--retry-delay', '0']
+
+        try:
+            tracemalloc.start()
+            start = time.perf_counter()
+            rc = data_fetcher.main(argv)
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(report_path) as f:
+                run_report = json.load(f)
+        finally:
+            data_fetcher.PRICE_STORE_DIR = store_dir_before
+
+    calls = {f"yahoo.{k}": v for k, v in sorted(quotes.calls.items())}
+    calls.update({f"db.{k}": v for k, v in sorted(db.calls.items())})
+    report = {
+        'wall_seconds': round(wall, 3),
+        'peak_memory_mb': round(peak / 1024 / 1024, 1),
+        'calls': calls,
+        'total_calls': sum(calls.values()),
+        'stages': {name: {k: stage[k] for k in ('count', 'errors', 'total_seconds', 'max_seconds')}
+                   for name, stage in run_report['stages'].items()},
+        'counters': run_report['counters'],
+    }
+    print(json.dumps(report, indent=2))
+    if rc:
+        raise SystemExit(f"pipeline run failed with exit code {rc}")
+    published, total = run_report['counters'].get('symbols_published', 0), run_report['counters']['symbols_total']
+    if published < total:
+        dropped = run_report.get('dropped_symbols', [])
+        raise SystemExit(f"pipeline published {published}/{total} symbols, dropped: {', '.join(dropped[:20])}")
+    if args.max_seconds and wall > args.max_seconds:
+        raise SystemExit(f"pipeline took {wall:.1f}s, budget is {args.max_seconds}s")
+    if args.max_calls and report['total_calls'] > args.max_calls:
+        raise SystemExit(f"pipeline made {report['total_calls']} calls, budget is {args.max_calls}")
+
+
+# data_fetcher import edilirken yüklenmemesi gereken ağır bağımlılıklar
+HEAVY_MODULES = ('pandas', 'numpy', 'yfinance', 'supabase')
+
+
+def bench_import(args):
+    """
+    data_fetcher'ı temiz bir yorumlayıcıda import eder; süreyi ve yüklenen ağır
+    modülleri raporlar. Kimlik bilgisi olmadan çalışır.
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import data_fetcher\n"
+        "print(json.dumps({'seconds': round(time.perf_counter() - start, 3),\n"
+        f"                  'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = {k: v for k, v in os.environ.items() if k not in ('SUPABASE_URL', 'SUPABASE_KEY')}
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['output'] = result.stdout.strip().splitlines()[:-1]
+    print(json.dumps(report, indent=2))
+    if report['loaded']:
+        raise SystemExit(f"importing data_fetcher loaded {', '.join(report['loaded'])}")
+    if report['output']:
+        raise SystemExit("importing data_fetcher printed output")
+    if args.max_seconds and report['seconds'] > args.max_seconds:
+        raise SystemExit(f"import took {report['seconds']}s, budget is {args.max_seconds}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BIST veri hattı benchmark'ları")
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p_returns = sub.add_parser('returns', help="Vektörel getiri motoru ve sembol bazlı yol")
+    p_returns.add_argument('--symbols', type=int, default=600)
+    p_returns.add_argument('--years', type=float, default=3)
+    p_returns.set_defaults(func=bench_returns)
+
+    p_breadth = sub.add_parser('breadth', help="Endeks genişlik/katkı analizi")
+    p_breadth.add_argument('--indices', type=int, default=45)
+    p_breadth.add_argument('--symbols', type=int, default=600)
+    p_breadth.add_argument('--repeat', type=int, default=20)
+    p_breadth.set_defaults(func=bench_breadth)
+
+    p_pipeline = sub.add_parser('pipeline', help="Tam günlük güncelleme, sahte arka uçlarla")
+    p_pipeline.add_argument('--latency-ms', type=float, default=20, help="Yahoo çağrısı başına gecikme")
+    p_pipeline.add_argument('--db-latency-ms', type=float, default=10, help="DB çağrısı başına gecikme")
+    p_pipeline.add_argument('--failure-rate', type=float, default=0.0, help="Çağrı başına hata olasılığı")
+    p_pipeline.add_argument('--missing-rate', type=float, default=0.0, help="Fiyatı gelmeyen sembol oranı")
+    p_pipeline.add_argument('--history-days', type=int, default=80, help="DB'ye tohumlanan iş günü sayısı")
+    p_pipeline.add_argument('--workers', type=int, default=8)
+    p_pipeline.add_argument('--max-seconds', type=float, default=0, help="Aşılırsa hata (0 = kontrol yok)")
+    p_pipeline.add_argument('--max-calls', type=int, default=0, help="Aşılırsa hata (0 = kontrol yok)")
+    p_pipeline.set_defaults(func=bench_pipeline)
+
+    p_import = sub.add_parser('import', help="data_fetcher import süresi ve yan etkileri")
+    p_import.add_argument('--max-seconds', type=float, default=0.5, help="Aşılırsa hata (0 = kontrol yok)")
+    p_import.set_defaults(func=bench_import)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,177 @@
-import yfinance as yf
-import pandas as pd
-from supabase import create_client, Client
 import os
+import sys
+import json
 import time
+import signal
+import argparse
+import importlib
+import threading
+from zoneinfo import ZoneInfo
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from metrics import METRICS
+from run_journal import RunJournal
+
+class _Lazy:
+    """
+    Bir modülü (ya da modüldeki bir nesneyi) ilk kullanımda içe aktaran vekil.
+    Böylece data_fetcher'ı import etmek pandas/numpy/yfinance ve onlara bağlı
+    yerel modülleri yüklemez; bunlar yalnızca bir komut gerçekten kullanınca yüklenir.
+    """
+
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr = attr
+
+    def _resolve(self):
+        obj = self.__dict__.get('_obj')
+        if obj is None:
+            obj = importlib.import_module(self._module)
+            if self._attr:
+                obj = getattr(obj, self._attr)
+            self._obj = obj
+        return obj
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+pd = _Lazy('pandas')
+np = _Lazy('numpy')
+yf = _Lazy('yfinance')
+
+PriceStore = _Lazy('price_store', 'PriceStore')
+compute_returns = _Lazy('return_engine', 'compute_returns')
+BIST_CALENDAR = _Lazy('trading_calendar', 'BIST_CALENDAR')
+load_membership = _Lazy('membership', 'load_membership')
+load_membership_between = _Lazy('membership', 'load_membership_between')
+compute_index_breadth = _Lazy('index_analytics', 'compute_index_breadth')
+
+class ConfigError(Exception):
+    """
+    Eksik kimlik bilgisi ya da geçersiz seçim gibi yapılandırma hataları.
+    """
+
 # --- AYARLAR ---
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    # .env dosyasından okumayı dene (lokal geliştirme için)
+def _load_credentials():
+    url, key = SUPABASE_URL, SUPABASE_KEY
+    if not url or not key:
+        # .env dosyasından okumayı dene (lokal geliştirme için)
+        try:
+            from dotenv import load_dotenv
+            load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), 'bist-takip', '.env'))
+            url = os.environ.get("VITE_SUPABASE_URL")
+            key = os.environ.get("VITE_SUPABASE_ANON_KEY")
+        except ImportError:
+            pass
+    return url, key
+
+def _create_client():
+    url, key = _load_credentials()
+    if not url or not key:
+        raise ConfigError("SUPABASE_URL veya SUPABASE_KEY eksik.")
+    from supabase import create_client
     try:
-        from dotenv import load_dotenv
-        load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), 'bist-takip', '.env'))
-        SUPABASE_URL = os.environ.get("VITE_SUPABASE_URL")
-        SUPABASE_KEY = os.environ.get("VITE_SUPABASE_ANON_KEY")
-    except:
-        pass
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Hata: SUPABASE_URL veya SUPABASE_KEY eksik.")
-
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-except Exception as e:
-    print(f"Bağlantı hatası: {e}")
-    supabase = None
+        return create_client(url, key)
+    except Exception as e:
+        raise ConfigError(f"Bağlantı hatası: {e}") from e
+
+class YahooQuotes:
+    """
+    Varsayılan fiyat kaynağı (yfinance).
+    Aynı arayüze sahip başka bir nesne set_backends ile takılabilir:
+    download(tickers, **kwargs) -> yf.download formatında DataFrame
+    history(symbol, **kwargs)   -> Ticker.history formatında DataFrame
+    """
+
+    def download(self, tickers, **kwargs):
+        return yf.download(tickers, **kwargs)
+
+    def history(self, symbol, **kwargs):
+        return yf.Ticker(symbol).history(**kwargs)
+
+_backends = {'client': None, 'quotes': YahooQuotes()}
+_backends_lock = threading.Lock()
+
+def get_client():
+    """
+    Kullanılan depolama (Supabase) istemcisini döner.
+    İstemci ilk çağrıda oluşturulur; kimlik bilgisi yoksa ConfigError fırlatır.
+    """
+    if _backends['client'] is None:
+        with _backends_lock:
+            if _backends['client'] is None:
+                _backends['client'] = _create_client()
+    return _backends['client']
+
+def get_quotes():
+    """
+    Kullanılan fiyat kaynağını döner.
+    """
+    return _backends['quotes']
+
+def set_backends(client=None, quotes=None):
+    """
+    Depolama istemcisini ve/veya fiyat kaynağını değiştirir
+    (ör. benchmark'larda sahte Supabase ve sentetik fiyatlar için).
+    """
+    if client is not None:
+        _backends['client'] = client
+    if quotes is not None:
+        _backends['quotes'] = quotes
+
+# Toplu fiyat indirme ayarı (tek istekte kaç sembol)
+QUOTE_CHUNK_SIZE = int(os.environ.get("QUOTE_CHUNK_SIZE", 100))
+
+# Eşzamanlılık ve Yahoo istek sınırı (CLI argümanlarıyla da değiştirilebilir)
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 8))
+FETCH_RATE = float(os.environ.get("FETCH_RATE", 4))  # saniyede istek, 0 = sınırsız
+FETCH_MAX_IN_FLIGHT = int(os.environ.get("FETCH_MAX_IN_FLIGHT", 4))
+
+# Toplu referans fiyat okuma: tek `in_` sorgusundaki en fazla sembol sayısı.
+# Supabase sorgu başına varsayılan olarak en fazla 1000 satır döndürür.
+REFERENCE_CHUNK_SIZE = int(os.environ.get("REFERENCE_CHUNK_SIZE", 200))
+SUPABASE_MAX_ROWS = 1000
+
+# Yerel fiyat deposu (GitHub Actions cache'i ile çalıştırmalar arasında saklanır)
+PRICE_STORE_DIR = os.environ.get("PRICE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'price_store'))
+# Depo boşken DB'den kaç günlük geçmiş çekileceği
+PRICE_STORE_HISTORY_DAYS = int(os.environ.get("PRICE_STORE_HISTORY_DAYS", 400))
+
+# Geçmiş veri yükleme (backfill) ayarları
+BACKFILL_CHUNK_SIZE = int(os.environ.get("BACKFILL_CHUNK_SIZE", 50))
+BACKFILL_BATCH_SIZE = int(os.environ.get("BACKFILL_BATCH_SIZE", 1000))
+BACKFILL_CHECKPOINT = os.environ.get("BACKFILL_CHECKPOINT", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backfill_checkpoint.json'))
+# History tablolarında yalnızca close kolonu var (bkz. upsert_price); OHLCV yazmak için
+# tabloya open/high/low/volume kolonları eklenip --fields ile istenmeli
+BACKFILL_FIELDS = ('close',)
+
+# Gün içi yenileme (daemon) ayarları
+DAEMON_INTERVAL_MINUTES = float(os.environ.get("DAEMON_INTERVAL_MINUTES", 5))
+MARKET_TZ = ZoneInfo("Europe/Istanbul")
+
+# Toplu yazma ayarları (history tabloları için batch boyutu ve yeniden deneme)
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", 500))
+WRITE_MAX_RETRIES = int(os.environ.get("WRITE_MAX_RETRIES", 3))
+WRITE_RETRY_DELAY = float(os.environ.get("WRITE_RETRY_DELAY", 1.0))
+
+# Çalıştırma raporu (JSON) ve isteğe bağlı Prometheus metin dosyası (boş = yazılmaz)
+RUN_REPORT_PATH = os.environ.get("RUN_REPORT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_report.json'))
+RUN_REPORT_PROMETHEUS = os.environ.get("RUN_REPORT_PROMETHEUS", "")
+
+# Çalıştırma günlüğü (boş = kapalı) ve sonuç alınamayan semboller için yeniden deneme turu
+RUN_JOURNAL_PATH = os.environ.get("RUN_JOURNAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_journal.jsonl'))
+RUN_RETRY_ATTEMPTS = int(os.environ.get("RUN_RETRY_ATTEMPTS", 2))
+RUN_RETRY_DELAY = float(os.environ.get("RUN_RETRY_DELAY", 5.0))
+# Sonuç alınamayan sembollerin bu oranı aşması (ör. Yahoo engeli) çalıştırmayı başarısız sayar
+RUN_MAX_DROPPED_SHARE = float(os.environ.get("RUN_MAX_DROPPED_SHARE", 0.1))
 
 # Takip Edilecek Endeksler
 INDICES = {
@@ -76,80 +221,13 @@ INDICES = {
     'XYUZO.IS': {'name': 'BIST 100-30', 'category': 'Genel'},
 }
 
-# Endekslerin içindeki hisseler (Güncel BIST Verileri ile Genişletildi)
-CONSTITUENTS = {
-    # --- ANA ENDEKSLER ---
-    'XU030.IS': [
-        'AKBNK.IS', 'ALARK.IS', 'ARCLK.IS', 'ASELS.IS', 'ASTOR.IS', 'BIMAS.IS', 'BRSAN.IS', 'EKGYO.IS', 'ENKAI.IS', 'EREGL.IS',
-        'FROTO.IS', 'GARAN.IS', 'GUBRF.IS', 'HEKTS.IS', 'ISCTR.IS', 'KCHOL.IS', 'KONTR.IS', 'TRALT.IS', 'KRDMD.IS', 'ODAS.IS',
-        'OYAKC.IS', 'PGSUS.IS', 'SAHOL.IS', 'SASA.IS', 'SISE.IS', 'TCELL.IS', 'THYAO.IS', 'TOASO.IS', 'TUPRS.IS', 'YKBNK.IS'
-    ],
-    'XU050.IS': [
-        'AKBNK.IS', 'ALARK.IS', 'ARCLK.IS', 'ASELS.IS', 'ASTOR.IS', 'BIMAS.IS', 'BRSAN.IS', 'EKGYO.IS', 'ENKAI.IS', 'EREGL.IS',
-        'FROTO.IS', 'GARAN.IS', 'GUBRF.IS', 'HEKTS.IS', 'ISCTR.IS', 'KCHOL.IS', 'KONTR.IS', 'TRALT.IS', 'KRDMD.IS', 'ODAS.IS',
-        'OYAKC.IS', 'PGSUS.IS', 'SAHOL.IS', 'SASA.IS', 'SISE.IS', 'TCELL.IS', 'THYAO.IS', 'TOASO.IS', 'TUPRS.IS', 'YKBNK.IS',
-        'AEFES.IS', 'AGHOL.IS', 'AKSA.IS', 'AKSEN.IS', 'ALFAS.IS', 'BERA.IS', 'CANTE.IS', 'CCOLA.IS', 'CIMSA.IS', 'DOHOL.IS',
-        'EGEEN.IS', 'ENJSA.IS', 'EUPWR.IS', 'GESAN.IS', 'HALKB.IS', 'ISGYO.IS', 'TRMET.IS', 'MGROS.IS', 'SMRTG.IS', 'SOKM.IS',
-        'TTKOM.IS', 'ULKER.IS', 'VAKBN.IS', 'VESTL.IS'
-    ],
-    'XU100.IS': [
-        'AGHOL.IS', 'AKBNK.IS', 'AKSA.IS', 'AKSEN.IS', 'ALARK.IS', 'ALBRK.IS', 'ALFAS.IS', 'ARCLK.IS', 'ASELS.IS', 'ASTOR.IS',
-        'BERA.IS', 'BIMAS.IS', 'BIOEN.IS', 'BRSAN.IS', 'BRYAT.IS', 'BUCIM.IS', 'CANTE.IS', 'CCOLA.IS', 'CEMTS.IS', 'CIMSA.IS',
-        'CWENE.IS', 'DOAS.IS', 'DOHOL.IS', 'ECILC.IS', 'ECZYT.IS', 'EGEEN.IS', 'EKGYO.IS', 'ENJSA.IS', 'ENKAI.IS', 'EREGL.IS',
-        'EUPWR.IS', 'EUREN.IS', 'FROTO.IS', 'GARAN.IS', 'GENIL.IS', 'GESAN.IS', 'GLYHO.IS', 'GSDHO.IS', 'GUBRF.IS', 'HALKB.IS',
-        'HEKTS.IS', 'IMASM.IS', 'TRENH.IS', 'ISCTR.IS', 'ISDMR.IS', 'ISGYO.IS', 'ISMEN.IS', 'IZMDC.IS', 'KARSN.IS', 'KAYSE.IS',
-        'KCAER.IS', 'KCHOL.IS', 'KONTR.IS', 'KONYA.IS', 'TRMET.IS', 'TRALT.IS', 'KRDMD.IS', 'KZBGY.IS', 'MAVI.IS', 'MGROS.IS',
-        'MIATK.IS', 'ODAS.IS', 'OTKAR.IS', 'OYAKC.IS', 'PENTA.IS', 'PETKM.IS', 'PGSUS.IS', 'PSGYO.IS', 'QUAGR.IS', 'SAHOL.IS',
-        'SASA.IS', 'SELEC.IS', 'SISE.IS', 'SKBNK.IS', 'SMRTG.IS', 'SNGYO.IS', 'SOKM.IS', 'TAVHL.IS', 'TCELL.IS', 'THYAO.IS',
-        'TKFEN.IS', 'TOASO.IS', 'TSKB.IS', 'TTKOM.IS', 'TTRAK.IS', 'TUKAS.IS', 'TUPRS.IS', 'TURSG.IS', 'ULKER.IS', 'VAKBN.IS',
-        'VESBE.IS', 'VESTL.IS', 'YEOTK.IS', 'YKBNK.IS', 'YYLGD.IS', 'ZOREN.IS'
-    ],
-    
-    # --- SEKTÖR ENDEKSLERİ ---
-    'XBANK.IS': ['AKBNK.IS', 'ALBRK.IS', 'GARAN.IS', 'HALKB.IS', 'ICBCT.IS', 'ISATR.IS', 'ISBTR.IS', 'ISCTR.IS', 'SKBNK.IS', 'TSKB.IS', 'VAKBN.IS', 'YKBNK.IS'],    
-    'XBLSM.IS': ['ALCTL.IS', 'ARDYZ.IS', 'ARENA.IS', 'ATATP.IS', 'AZTEK.IS', 'BINBN.IS', 'DESPC.IS', 'DGATE.IS', 'DOFRB.IS', 'EDATA.IS', 'ESCOM.IS', 'FONET.IS', 'FORTE.IS', 'HTTBT.IS', 'INDES.IS', 'INGRM.IS', 'KAREL.IS', 'KFEIN.IS', 'KRONT.IS', 'LINK.IS', 'LOGO.IS', 'MANAS.IS', 'MIATK.IS', 'MOBTL.IS', 'MTRKS.IS', 'NETAS.IS', 'NETCD.IS', 'OBASE.IS', 'ODINE.IS', 'PAPIL.IS', 'PATEK.IS', 'PENTA.IS', 'PKART.IS', 'REEDR.IS', 'SMART.IS', 'VBTYZ.IS'],    
-    'XELKT.IS': ['A1YEN.IS', 'AHGAZ.IS', 'AKENR.IS', 'AKFYE.IS', 'AKSEN.IS', 'AKSUE.IS', 'ALFAS.IS', 'ARASE.IS', 'ARFYE.IS', 'AYDEM.IS', 'AYEN.IS', 'BESTE.IS', 'BIGEN.IS', 'BIOEN.IS', 'CANTE.IS', 'CATES.IS', 'CONSE.IS', 'CWENE.IS', 'ECOGR.IS', 'ENDAE.IS', 'ENERY.IS', 'ENJSA.IS', 'ENTRA.IS', 'ESEN.IS', 'GWIND.IS', 'HUNER.IS', 'IZENR.IS', 'KLYPV.IS', 'LYDYE.IS', 'MAGEN.IS', 'MOGAN.IS', 'NATEN.IS', 'NTGAZ.IS', 'ODAS.IS', 'PAMEL.IS', 'SMRTG.IS', 'TATEN.IS', 'ZEDUR.IS', 'ZOREN.IS'],    
-    'XFINK.IS': ['CRDFA.IS', 'DSTKF.IS', 'GARFA.IS', 'ISFIN.IS', 'LIDFA.IS', 'SEKFK.IS', 'ULUFA.IS', 'VAKFA.IS', 'VAKFN.IS'],    
-    'XGIDA.IS': ['AEFES.IS', 'AKHAN.IS', 'ALKLC.IS', 'ARMGD.IS', 'ATAKP.IS', 'AVOD.IS', 'BALSU.IS', 'BANVT.IS', 'BESLR.IS', 'BORSK.IS', 'CCOLA.IS', 'CEMZY.IS', 'DARDL.IS', 'DMRGD.IS', 'DURKN.IS', 'EFOR.IS', 'EKSUN.IS', 'ELITE.IS', 'ERSU.IS', 'FADE.IS', 'FRIGO.IS', 'GOKNR.IS', 'GUNDG.IS', 'KAYSE.IS', 'KRSTL.IS', 'KRVGD.IS', 'KTSKR.IS', 'MERKO.IS', 'MEYSU.IS', 'OBAMS.IS', 'OFSYM.IS', 'ORCAY.IS', 'OYLUM.IS', 'PENGD.IS', 'PETUN.IS', 'PINSU.IS', 'PNSUT.IS', 'SEGMN.IS', 'SELVA.IS', 'SOKE.IS', 'TATGD.IS', 'TBORG.IS', 'TUKAS.IS', 'ULKER.IS', 'ULUUN.IS', 'VANGD.IS', 'YYLGD.IS'],    
-    'XGMYO.IS': ['ADGYO.IS', 'AGYO.IS', 'AHSGY.IS', 'AKFGY.IS', 'AKMGY.IS', 'AKSGY.IS', 'ALGYO.IS', 'ASGYO.IS', 'ATAGY.IS', 'AVGYO.IS', 'AVPGY.IS', 'BASGZ.IS', 'BEGYO.IS', 'DGGYO.IS', 'DZGYO.IS', 'EGEGY.IS', 'EKGYO.IS', 'EYGYO.IS', 'FZLGY.IS', 'HLGYO.IS', 'IDGYO.IS', 'ISGYO.IS', 'KGYO.IS', 'KLGYO.IS', 'KRGYO.IS', 'KZBGY.IS', 'KZGYO.IS', 'MHRGY.IS', 'MRGYO.IS', 'MSGYO.IS', 'NUGYO.IS', 'OZGYO.IS', 'OZKGY.IS', 'PAGYO.IS', 'PEKGY.IS', 'PSGYO.IS', 'RYGYO.IS', 'SEGYO.IS', 'SNGYO.IS', 'SRVGY.IS', 'SURGY.IS', 'TDGYO.IS', 'TRGYO.IS', 'TSGYO.IS', 'VKGYO.IS', 'VRGYO.IS', 'YGGYO.IS', 'ZERGY.IS', 'ZGYO.IS', 'ZRGYO.IS'],    
-    'XHOLD.IS': ['AGHOL.IS', 'AKYHO.IS', 'ALARK.IS', 'ARSAN.IS', 'AVHOL.IS', 'BERA.IS', 'BINHO.IS', 'BRYAT.IS', 'BULGS.IS', 'COSMO.IS', 'DENGE.IS', 'DERHL.IS', 'DOHOL.IS', 'DUNYH.IS', 'ECILC.IS', 'ECZYT.IS', 'GLRYH.IS', 'GLYHO.IS', 'GOZDE.IS', 'GRTHO.IS', 'GSDHO.IS', 'HDFGS.IS', 'HEDEF.IS', 'HUBVC.IS', 'ICUGS.IS', 'IEYHO.IS', 'IHLAS.IS', 'IHYAY.IS', 'INVEO.IS', 'INVES.IS', 'ISGSY.IS', 'KCHOL.IS', 'KLRHO.IS', 'LRSHO.IS', 'LYDHO.IS', 'MARKA.IS', 'METRO.IS', 'MZHLD.IS', 'NTHOL.IS', 'OSTIM.IS', 'OTTO.IS', 'PAHOL.IS', 'POLHO.IS', 'PRDGS.IS', 'RALYH.IS', 'SAHOL.IS', 'SISE.IS', 'TAVHL.IS', 'TEHOL.IS', 'TKFEN.IS', 'TRCAS.IS', 'TRHOL.IS', 'UFUK.IS', 'UNLU.IS', 'VERTU.IS', 'VERUS.IS', 'YESIL.IS'],    
-    'XILTM.IS': ['TCELL.IS', 'TTKOM.IS'],    
-    'XINSA.IS': ['AKFIS.IS', 'ANELE.IS', 'BRLSM.IS', 'DAPGM.IS', 'EDIP.IS', 'ENKAI.IS', 'GESAN.IS', 'GLRMK.IS', 'KUYAS.IS', 'ORGE.IS', 'SANEL.IS', 'TURGG.IS', 'UCAYM.IS', 'YAYLA.IS', 'YYAPI.IS'],    
-    'XKMYA.IS': ['ACSEL.IS', 'AKSA.IS', 'ALKIM.IS', 'ANGEN.IS', 'AYGAZ.IS', 'BAGFS.IS', 'BAHKM.IS', 'BAYRK.IS', 'BRISA.IS', 'BRKSN.IS', 'DEVA.IS', 'DNISI.IS', 'DYOBY.IS', 'EGGUB.IS', 'EGPRO.IS', 'EPLAS.IS', 'EUREN.IS', 'FRMPL.IS', 'GEDZA.IS', 'GOODY.IS', 'GUBRF.IS', 'HEKTS.IS', 'ISKPL.IS', 'IZFAS.IS', 'KBORU.IS', 'KMPUR.IS', 'KOPOL.IS', 'KRPLS.IS', 'MARMR.IS', 'MEDTR.IS', 'MERCN.IS', 'MRSHL.IS', 'ONCSM.IS', 'OZRDN.IS', 'PETKM.IS', 'POLTK.IS', 'RNPOL.IS', 'RTALB.IS', 'SANFM.IS', 'SASA.IS', 'SEKUR.IS', 'SEYKM.IS', 'TARKM.IS', 'TMPOL.IS', 'TRILC.IS', 'TUPRS.IS'],    
-    'XMADN.IS': ['CVKMD.IS', 'PRKME.IS', 'RUZYE.IS', 'TRALT.IS', 'TRENJ.IS', 'TRMET.IS', 'VSNMD.IS'],    
-    'XMANA.IS': ['BLUME.IS', 'BMSCH.IS', 'BMSTL.IS', 'BRSAN.IS', 'BURCE.IS', 'BURVA.IS', 'CELHA.IS', 'CEMAS.IS', 'CEMTS.IS', 'CUSAN.IS', 'DMSAS.IS', 'DOFER.IS', 'DOKTA.IS', 'ERBOS.IS', 'ERCB.IS', 'EREGL.IS', 'ISDMR.IS', 'IZMDC.IS', 'KCAER.IS', 'KOCMT.IS', 'KRDMA.IS', 'KRDMB.IS', 'KRDMD.IS', 'MEGMT.IS', 'OZYSR.IS', 'PNLSN.IS', 'SARKY.IS', 'TCKRC.IS', 'TUCLK.IS', 'YKSLN.IS'],    
-    'XMESY.IS': ['ALCAR.IS', 'ALVES.IS', 'ARCLK.IS', 'ASTOR.IS', 'ASUZU.IS', 'BFREN.IS', 'BNTAS.IS', 'BVSAN.IS', 'DITAS.IS', 'EGEEN.IS', 'EKOS.IS', 'EMKEL.IS', 'EUPWR.IS', 'FMIZP.IS', 'FORMT.IS', 'FROTO.IS', 'GEREL.IS', 'HATSN.IS', 'HKTM.IS', 'IHEVA.IS', 'IMASM.IS', 'JANTS.IS', 'KARSN.IS', 'KATMR.IS', 'KLMSN.IS', 'MAKIM.IS', 'MAKTK.IS', 'MEKAG.IS', 'OTKAR.IS', 'OZATD.IS', 'PARSN.IS', 'PRKAB.IS', 'SAFKR.IS', 'SAYAS.IS', 'SILVR.IS', 'SNICA.IS', 'TMSN.IS', 'TOASO.IS', 'TTRAK.IS', 'ULUSE.IS', 'VESBE.IS', 'VESTL.IS', 'YIGIT.IS'],    
-    'XSGRT.IS': ['AGESA.IS', 'AKGRT.IS', 'ANHYT.IS', 'ANSGR.IS', 'RAYSG.IS', 'TURSG.IS'],    
-    'XSPOR.IS': ['BJKAS.IS', 'FENER.IS', 'GSRAY.IS', 'TSPOR.IS'],    
-    'XTAST.IS': ['AFYON.IS', 'AKCNS.IS', 'BIENY.IS', 'BOBET.IS', 'BSOKE.IS', 'BTCIM.IS', 'BUCIM.IS', 'CGCAM.IS', 'CIMSA.IS', 'CMBTN.IS', 'DOGUB.IS', 'EGSER.IS', 'GOLTS.IS', 'KLKIM.IS', 'KLSER.IS', 'KONYA.IS', 'KUTPO.IS', 'LMKDC.IS', 'MARBL.IS', 'NIBAS.IS', 'NUHCM.IS', 'OYAKC.IS', 'QUAGR.IS', 'SERNT.IS', 'USAK.IS'],    
-    'XTCRT.IS': ['ARZUM.IS', 'BIMAS.IS', 'BIZIM.IS', 'CRFSA.IS', 'DCTTR.IS', 'DOAS.IS', 'EBEBK.IS', 'GENIL.IS', 'GMTAS.IS', 'INTEM.IS', 'KIMMR.IS', 'KOTON.IS', 'MAVI.IS', 'MEPET.IS', 'MGROS.IS', 'MOPAS.IS', 'PSDTC.IS', 'SANKO.IS', 'SELEC.IS', 'SOKM.IS', 'SUWEN.IS', 'TGSAS.IS', 'TKNSA.IS', 'VAKKO.IS'],    
-    'XTEKS.IS': ['ARTMS.IS', 'BLCYT.IS', 'BOSSA.IS', 'DAGI.IS', 'DERIM.IS', 'DESA.IS', 'ENSRI.IS', 'HATEK.IS', 'ISSEN.IS', 'KORDS.IS'],   
-    'XTRZM.IS': ['AVTUR.IS', 'AYCES.IS', 'BIGCH.IS', 'BYDNR.IS', 'DOCO.IS', 'ETILR.IS', 'MAALT.IS', 'MARTI.IS', 'MERIT.IS', 'PKENT.IS', 'TABGD.IS', 'TEKTU.IS', 'ULAS.IS'],    
-    'XULAS.IS': ['BEYAZ.IS', 'CLEBI.IS', 'GRSEL.IS', 'GSDDE.IS', 'HOROZ.IS', 'HRKET.IS', 'PASEU.IS', 'PGSUS.IS', 'RYSAS.IS', 'THYAO.IS', 'TLMAN.IS', 'TUREX.IS'],    
-    'XUSIN.IS': ['ACSEL.IS', 'ADEL.IS', 'AEFES.IS', 'AFYON.IS', 'AGROT.IS', 'AKCNS.IS', 'AKHAN.IS', 'AKSA.IS', 'ALCAR.IS', 'ALKA.IS', 'ALKIM.IS', 'ALKLC.IS', 'ALVES.IS', 'ANGEN.IS', 'ARCLK.IS', 'ARMGD.IS', 'ARTMS.IS', 'ASTOR.IS', 'ASUZU.IS', 'ATAKP.IS', 'AVOD.IS', 'AYGAZ.IS', 'BAGFS.IS', 'BAHKM.IS', 'BAKAB.IS', 'BALSU.IS', 'BANVT.IS', 'BARMA.IS', 'BAYRK.IS', 'BESLR.IS', 'BFREN.IS', 'BIENY.IS', 'BLCYT.IS', 'BLUME.IS', 'BMSCH.IS', 'BMSTL.IS', 'BNTAS.IS', 'BOBET.IS', 'BORSK.IS', 'BOSSA.IS', 'BRISA.IS', 'BRKSN.IS', 'BRSAN.IS', 'BSOKE.IS', 'BTCIM.IS', 'BUCIM.IS', 'BURCE.IS', 'BURVA.IS', 'BVSAN.IS', 'CCOLA.IS', 'CELHA.IS', 'CEMAS.IS', 'CEMTS.IS', 'CEMZY.IS', 'CGCAM.IS', 'CIMSA.IS', 'CMBTN.IS', 'CUSAN.IS', 'CVKMD.IS', 'DAGI.IS', 'DARDL.IS', 'DERIM.IS', 'DESA.IS', 'DEVA.IS', 'DGNMO.IS', 'DITAS.IS', 'DMRGD.IS', 'DMSAS.IS', 'DNISI.IS', 'DOFER.IS', 'DOGUB.IS', 'DOKTA.IS', 'DURDO.IS', 'DURKN.IS', 'DYOBY.IS', 'EFOR.IS', 'EGEEN.IS', 'EGGUB.IS', 'EGPRO.IS', 'EGSER.IS', 'EKOS.IS', 'EKSUN.IS', 'ELITE.IS', 'EMKEL.IS', 'ENSRI.IS', 'EPLAS.IS', 'ERBOS.IS', 'ERCB.IS', 'EREGL.IS', 'ERSU.IS', 'EUPWR.IS', 'EUREN.IS', 'FADE.IS', 'FMIZP.IS', 'FORMT.IS', 'FRIGO.IS', 'FRMPL.IS', 'FROTO.IS', 'GEDZA.IS', 'GENTS.IS', 'GEREL.IS', 'GIPTA.IS', 'GOKNR.IS', 'GOLTS.IS', 'GOODY.IS', 'GUBRF.IS', 'GUNDG.IS', 'HATEK.IS', 'HATSN.IS', 'HEKTS.IS', 'HKTM.IS', 'IHEVA.IS', 'IMASM.IS', 'ISDMR.IS', 'ISKPL.IS', 'ISSEN.IS', 'IZFAS.IS', 'IZINV.IS', 'IZMDC.IS', 'JANTS.IS', 'KAPLM.IS', 'KARSN.IS', 'KARTN.IS', 'KATMR.IS', 'KAYSE.IS', 'KBORU.IS', 'KCAER.IS', 'KLKIM.IS', 'KLMSN.IS', 'KLSER.IS', 'KLSYN.IS', 'KMPUR.IS', 'KNFRT.IS', 'KOCMT.IS', 'KONKA.IS', 'KONYA.IS', 'KOPOL.IS', 'KORDS.IS', 'KRDMA.IS', 'KRDMB.IS', 'KRDMD.IS', 'KRPLS.IS', 'KRSTL.IS', 'KRTEK.IS', 'KRVGD.IS', 'KTSKR.IS', 'KUTPO.IS', 'LILAK.IS', 'LMKDC.IS', 'LUKSK.IS', 'MAKIM.IS', 'MAKTK.IS', 'MARBL.IS', 'MARMR.IS', 'MEDTR.IS', 'MEGMT.IS', 'MEKAG.IS', 'MERCN.IS', 'MERKO.IS', 'MEYSU.IS', 'MNDRS.IS', 'MNDTR.IS', 'MRSHL.IS', 'NIBAS.IS', 'NUHCM.IS', 'OBAMS.IS', 'OFSYM.IS', 'ONCSM.IS', 'ORCAY.IS', 'OTKAR.IS', 'OYAKC.IS', 'OYLUM.IS', 'OZATD.IS', 'OZRDN.IS', 'OZSUB.IS', 'OZYSR.IS', 'PARSN.IS', 'PENGD.IS', 'PETKM.IS', 'PETUN.IS', 'PINSU.IS', 'PNLSN.IS', 'PNSUT.IS', 'POLTK.IS', 'PRKAB.IS', 'PRKME.IS', 'PRZMA.IS', 'QUAGR.IS', 'RNPOL.IS', 'RODRG.IS', 'RTALB.IS', 'RUBNS.IS', 'RUZYE.IS', 'SAFKR.IS', 'SAMAT.IS', 'SANFM.IS', 'SARKY.IS', 'SASA.IS', 'SAYAS.IS', 'SEGMN.IS', 'SEKUR.IS', 'SELVA.IS', 'SERNT.IS', 'SEYKM.IS', 'SILVR.IS', 'SKTAS.IS', 'SNICA.IS', 'SOKE.IS', 'SUNTK.IS', 'TARKM.IS', 'TATGD.IS', 'TBORG.IS', 'TCKRC.IS', 'TEZOL.IS', 'TMPOL.IS', 'TMSN.IS', 'TOASO.IS', 'TRALT.IS', 'TRENJ.IS', 'TRILC.IS', 'TRMET.IS', 'TTRAK.IS', 'TUCLK.IS', 'TUKAS.IS', 'TUPRS.IS', 'ULKER.IS', 'ULUSE.IS', 'ULUUN.IS', 'USAK.IS', 'VANGD.IS', 'VESBE.IS', 'VESTL.IS', 'VKING.IS', 'VSNMD.IS', 'YAPRK.IS', 'YATAS.IS', 'YIGIT.IS', 'YKSLN.IS', 'YUNSA.IS', 'YYLGD.IS'],    
-    'XUTEK.IS': ['ALCTL.IS', 'ALTNY.IS', 'ARDYZ.IS', 'ARENA.IS', 'ASELS.IS', 'ATATP.IS', 'AZTEK.IS', 'BINBN.IS', 'DESPC.IS', 'DGATE.IS', 'DOFRB.IS', 'EDATA.IS', 'ESCOM.IS', 'FONET.IS', 'FORTE.IS', 'HTTBT.IS', 'INDES.IS', 'INGRM.IS', 'KAREL.IS', 'KFEIN.IS', 'KRONT.IS', 'LINK.IS', 'LOGO.IS', 'MANAS.IS', 'MIATK.IS', 'MOBTL.IS', 'MTRKS.IS', 'NETAS.IS', 'NETCD.IS', 'OBASE.IS', 'ODINE.IS', 'ONRYT.IS', 'PAPIL.IS', 'PATEK.IS', 'PENTA.IS', 'PKART.IS', 'REEDR.IS', 'SDTTR.IS', 'SMART.IS', 'VBTYZ.IS'],   
-    'XAKUR.IS': ['A1CAP.IS', 'GEDIK.IS', 'GLBMD.IS', 'INFO.IS', 'ISMEN.IS', 'OSMEN.IS', 'OYYAT.IS', 'SKYMD.IS', 'TERA.IS'],
-    'XLBNK.IS': ['AKBNK.IS', 'GARAN.IS', 'HALKB.IS', 'ISCTR.IS', 'VAKBN.IS', 'YKBNK.IS'],
-    'X10XB.IS': ['ASELS.IS', 'BIMAS.IS', 'EKGYO.IS', 'EREGL.IS', 'KCHOL.IS', 'PGSUS.IS', 'SASA.IS', 'TCELL.IS', 'THYAO.IS', 'TUPRS.IS'],
-    'XSD25.IS': ['AEFES.IS', 'AKBNK.IS', 'ARCLK.IS', 'ASELS.IS', 'BIMAS.IS', 'CIMSA.IS', 'DOAS.IS', 'ENKAI.IS', 'FROTO.IS', 'GARAN.IS', 'ISCTR.IS', 'KCHOL.IS', 'MAVI.IS', 'MGROS.IS', 'OYAKC.IS', 'PETKM.IS', 'PGSUS.IS', 'SAHOL.IS', 'SISE.IS', 'TAVHL.IS', 'TCELL.IS', 'THYAO.IS', 'TSKB.IS', 'TUPRS.IS', 'ULKER.IS'],
-    'XUHIZ.IS': ['A1YEN.IS', 'ADESE.IS', 'AHGAZ.IS', 'AKENR.IS', 'AKFIS.IS', 'AKFYE.IS', 'AKSEN.IS', 'AKSUE.IS', 'ALFAS.IS', 'ANELE.IS', 'ARASE.IS', 'ARFYE.IS', 'ARZUM.IS', 'AVTUR.IS', 'AYCES.IS', 'AYDEM.IS', 'AYEN.IS', 'BESTE.IS', 'BEYAZ.IS', 'BIGCH.IS', 'BIGEN.IS', 'BIGTK.IS', 'BIMAS.IS', 'BIOEN.IS', 'BIZIM.IS', 'BJKAS.IS', 'BORLS.IS', 'BRLSM.IS', 'BYDNR.IS', 'CANTE.IS', 'CATES.IS', 'CEOEM.IS', 'CLEBI.IS', 'CONSE.IS', 'CRFSA.IS', 'CWENE.IS', 'DAPGM.IS', 'DCTTR.IS', 'DOAS.IS', 'DOCO.IS', 'EBEBK.IS', 'ECOGR.IS', 'EDIP.IS', 'EGEPO.IS', 'ENDAE.IS', 'ENERY.IS', 'ENJSA.IS', 'ENKAI.IS', 'ENTRA.IS', 'ESCAR.IS', 'ESEN.IS', 'ETILR.IS', 'FENER.IS', 'FLAP.IS', 'GENIL.IS', 'GESAN.IS', 'GLRMK.IS', 'GMTAS.IS', 'GRSEL.IS', 'GSDDE.IS', 'GSRAY.IS', 'GWIND.IS', 'GZNMI.IS', 'HOROZ.IS', 'HRKET.IS', 'HUNER.IS', 'HURGZ.IS', 'IHAAS.IS', 'IHGZT.IS', 'IHLGM.IS', 'INTEM.IS', 'IZENR.IS', 'KIMMR.IS', 'KLYPV.IS', 'KONTR.IS', 'KOTON.IS', 'KUYAS.IS', 'LIDER.IS', 'LKMNH.IS', 'LYDYE.IS', 'MAALT.IS', 'MACKO.IS', 'MAGEN.IS', 'MARTI.IS', 'MAVI.IS', 'MEPET.IS', 'MERIT.IS', 'MGROS.IS', 'MOGAN.IS', 'MOPAS.IS', 'MPARK.IS', 'NATEN.IS', 'NTGAZ.IS', 'ODAS.IS', 'ORGE.IS', 'PAMEL.IS', 'PASEU.IS', 'PCILT.IS', 'PGSUS.IS', 'PKENT.IS', 'PLTUR.IS', 'PSDTC.IS', 'RGYAS.IS', 'RYSAS.IS', 'SANEL.IS', 'SANKO.IS', 'SELEC.IS', 'SKYLP.IS', 'SMRTG.IS', 'SOKM.IS', 'SONME.IS', 'SUWEN.IS', 'TABGD.IS', 'TATEN.IS', 'TCELL.IS', 'TEKTU.IS', 'TGSAS.IS', 'THYAO.IS', 'TKNSA.IS', 'TLMAN.IS', 'TNZTP.IS', 'TSPOR.IS', 'TTKOM.IS', 'TUREX.IS', 'TURGG.IS', 'UCAYM.IS', 'ULAS.IS', 'VAKKO.IS', 'YAYLA.IS', 'YEOTK.IS', 'YYAPI.IS', 'ZEDUR.IS', 'ZOREN.IS'],
-    'XYORT.IS': ['ATLAS.IS', 'ETYAT.IS', 'EUKYO.IS', 'EUYO.IS', 'GRNYO.IS', 'ISYAT.IS', 'MTRYO.IS', 'OYAYO.IS', 'VKFYO.IS'],
-    'XYUZO.IS': ['AGHOL.IS', 'AKSA.IS', 'AKSEN.IS', 'ALARK.IS', 'ALTNY.IS', 'ANSGR.IS', 'ARCLK.IS', 'BALSU.IS', 'BRSAN.IS', 'BRYAT.IS', 'BSOKE.IS', 'BTCIM.IS', 'CANTE.IS', 'CCOLA.IS', 'CIMSA.IS', 'CWENE.IS', 'DAPGM.IS', 'DOAS.IS', 'DOHOL.IS', 'ECILC.IS', 'EFOR.IS', 'EGEEN.IS', 'ENERY.IS', 'ENJSA.IS', 'EUPWR.IS', 'FENER.IS', 'GENIL.IS', 'GESAN.IS', 'GLRMK.IS', 'GRSEL.IS', 'GRTHO.IS', 'GSRAY.IS', 'HALKB.IS', 'HEKTS.IS', 'ISMEN.IS', 'IZENR.IS', 'KCAER.IS', 'KLRHO.IS', 'KONTR.IS', 'KTLEV.IS', 'KUYAS.IS', 'MAGEN.IS', 'MAVI.IS', 'MIATK.IS', 'MPARK.IS', 'OBAMS.IS', 'ODAS.IS', 'OTKAR.IS', 'OYAKC.IS', 'PASEU.IS', 'PATEK.IS', 'QUAGR.IS', 'RALYH.IS', 'REEDR.IS', 'SKBNK.IS', 'SOKM.IS', 'TABGD.IS', 'TKFEN.IS', 'TRENJ.IS', 'TRMET.IS', 'TSKB.IS', 'TSPOR.IS', 'TTRAK.IS', 'TUKAS.IS', 'TUREX.IS', 'TURSG.IS', 'VAKBN.IS', 'VESTL.IS', 'YEOTK.IS', 'ZOREN.IS'],
-    
-    # --- EKSİK ENDEKSLER (DOLDURULACAK) ---
-    'XU500.IS': [],
-    'XUTUM.IS': [],
-    'XHARZ.IS': [],
-    'XK030.IS': [],
-    'XKTMT.IS': [],
-    'XKTUM.IS': [],
-    'XTM25.IS': [],
-    'XTMTU.IS': [],
-    'XTUMY.IS': [],
-    'XUGRA.IS': [],
-    'XUMAL.IS': [],
-    'XYLDZ.IS': [],
-}
+# Endekslerin içindeki hisseler data/constituents.json dosyasında tutulur (bkz. membership.py)
+
+def clean_symbol(symbol):
+    """
+    Sembolü veritabanında tutulan forma çevirir ('THYAO.IS' -> 'THYAO').
+    """
+    return symbol.replace('.IS', '')
 
 def get_db_price(symbol, target_date, table_name='bist_index_history'):
     """
@@ -157,11 +235,12 @@ def get_db_price(symbol, target_date, table_name='bist_index_history'):
     Eğer o tarihte yoksa, None döner.
     """
     try:
-        response = supabase.table(table_name) \
-            .select('close') \
-            .eq('symbol', symbol) \
-            .eq('date', target_date.strftime('%Y-%m-%d')) \
-            .execute()
+        with METRICS.stage('reference_lookup'):
+            response = get_client().table(table_name) \
+                .select('close') \
+                .eq('symbol', clean_symbol(symbol)) \
+                .eq('date', target_date.strftime('%Y-%m-%d')) \
+                .execute()
         
         if response.data and len(response.data) > 0:
             return float(response.data[0]['close'])
@@ -170,88 +249,390 @@ def get_db_price(symbol, target_date, table_name='bist_index_history'):
         print(f"DB Read Error for {symbol} in {table_name} on {target_date}: {e}")
         return None
 
-def upsert_price(symbol, price, date, table_name='bist_index_history'):
+def upsert_batches(table_name, rows, batch_size=100, client=None,
+                   retries=WRITE_MAX_RETRIES, retry_delay=WRITE_RETRY_DELAY):
+    """
+    Satırları batch_size'lık parçalar halinde upsert eder.
+    Hata veren parça artan beklemeyle yeniden denenir; tüm denemeler
+    başarısız olursa parça raporlanıp atlanır.
+    Başarısız parça sayısını döner.
+    """
+    if client is None:
+        client = get_client()
+
+    failed = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        for attempt in range(1, retries + 1):
+            try:
+                with METRICS.stage('publish'):
+                    client.table(table_name).upsert(batch).execute()
+                break
+            except Exception as e:
+                print(f"DB Upsert Error in {table_name} (batch {i // batch_size}, {len(batch)} rows, "
+                      f"attempt {attempt}/{retries}): {e}")
+                if attempt < retries:
+                    METRICS.incr('publish_retries')
+                    time.sleep(retry_delay * attempt)
+        else:
+            failed += 1
+            METRICS.incr('publish_failed_batches')
+    return failed
+
+class HistoryWriter:
+    """
+    Geçmiş fiyat satırlarını tablo bazında biriktirir ve toplu halde yazar.
+    Aynı (symbol, date) için birden fazla değer gelirse sonuncusu yazılır.
+    """
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, client=None):
+        self.batch_size = batch_size
+        self.client = client
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def add(self, table_name, symbol, date, close):
+        key = (clean_symbol(symbol), date.strftime('%Y-%m-%d'))
+        with self.lock:
+            self.buffers.setdefault(table_name, {})[key] = close
+
+    def pending(self):
+        return sum(len(buf) for buf in self.buffers.values())
+
+    def rows(self, table_name):
+        """
+        Tablo için bekleyen satırları (symbol, date, close) olarak döner.
+        """
+        with self.lock:
+            return [(sym, day, close) for (sym, day), close in self.buffers.get(table_name, {}).items()]
+
+    def flush(self):
+        """
+        Bekleyen tüm satırları yazar ve başarısız batch sayısını döner.
+        """
+        with self.lock:
+            buffers, self.buffers = self.buffers, {}
+
+        failed = 0
+        for table_name, buf in buffers.items():
+            rows = [{'symbol': sym, 'date': day, 'close': close} for (sym, day), close in buf.items()]
+            failed += upsert_batches(table_name, rows, self.batch_size, client=self.client)
+        return failed
+
+class RateLimiter:
+    """
+    Yahoo isteklerini sınırlayan token bucket.
+    Saniyede en fazla `rate` istek (anlık en fazla `burst` kadar) geçer ve
+    aynı anda en fazla `max_in_flight` istek açık olabilir. Thread-safe'tir.
+    Kullanım: `with limiter: ...istek...`
+    """
+
+    def __init__(self, rate=FETCH_RATE, max_in_flight=FETCH_MAX_IN_FLIGHT, burst=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+        self.in_flight = threading.BoundedSemaphore(max(1, max_in_flight))
+
+    def _take_token(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            METRICS.incr('rate_limit_wait_seconds', wait)
+            self.sleep(wait)
+
+    def __enter__(self):
+        self.in_flight.acquire()
+        try:
+            self._take_token()
+        except BaseException:
+            self.in_flight.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.in_flight.release()
+        return False
+
+def run_concurrently(func, items, workers=FETCH_WORKERS):
+    """
+    func'ı items üzerinde thread havuzunda çalıştırır.
+    Sonuçlar girdi sırasıyla döner; böylece çıktı eşzamanlılıktan bağımsızdır.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
+
+def upsert_price(symbol, price, date, table_name='bist_index_history', writer=None):
     """
     Günlük kapanış fiyatını veritabanına kaydeder/günceller.
+    writer verilirse satır hemen yazılmaz, toplu yazma için tampona eklenir.
     """
+    if writer is not None:
+        writer.add(table_name, symbol, date, price)
+        return
+
     try:
         data = {
-            'symbol': symbol.replace('.IS', ''),
+            'symbol': clean_symbol(symbol),
             'date': date.strftime('%Y-%m-%d'),
             'close': price
         }
-        supabase.table(table_name).upsert(data).execute()
+        with METRICS.stage('publish'):
+            get_client().table(table_name).upsert(data).execute()
     except Exception as e:
         print(f"DB Upsert Error for {symbol} in {table_name}: {e}")
 
+def load_reference_prices(symbols, dates, table_name='bist_index_history', client=None):
+    """
+    Tüm semboller ve tüm referans tarihleri için kapanış fiyatlarını
+    birkaç toplu `in_` sorgusuyla çeker (sembol başına ayrı sorgu atılmaz).
+    Dönen sözlük: (temiz sembol, 'YYYY-MM-DD') -> close
+    Semboller '.IS' ekli ya da ekisiz verilebilir; hepsi temiz forma çevrilir.
+    """
+    if client is None:
+        client = get_client()
+
+    clean_syms = list(dict.fromkeys(clean_symbol(s) for s in symbols))
+    date_strs = sorted({d.strftime('%Y-%m-%d') for d in dates})
+    prices = {}
+    if not clean_syms or not date_strs:
+        return prices
+
+    # Her chunk'ın dönebileceği satır sayısı 1000 sınırını aşmasın
+    chunk_size = max(1, min(REFERENCE_CHUNK_SIZE, SUPABASE_MAX_ROWS // len(date_strs)))
+    for i in range(0, len(clean_syms), chunk_size):
+        chunk = clean_syms[i:i + chunk_size]
+        try:
+            with METRICS.stage('reference_lookup'):
+                response = client.table(table_name) \
+                    .select('symbol,date,close') \
+                    .in_('symbol', chunk) \
+                    .in_('date', date_strs) \
+                    .execute()
+        except Exception as e:
+            print(f"DB Bulk Read Error in {table_name} (chunk {i // chunk_size}): {e}")
+            continue
+
+        for row in response.data or []:
+            if row.get('close') is not None:
+                prices[(row['symbol'], str(row['date'])[:10])] = float(row['close'])
+
+    return prices
+
+def sync_price_store(store, table_name, client=None, history_days=PRICE_STORE_HISTORY_DAYS):
+    """
+    Yerel depoyu DB ile eşitler: yalnızca son başarılı eşitlemenin vardığı
+    günden (store.synced_through) itibaren olan satırlar sayfa sayfa çekilir
+    (son gün, gün içinde güncellenmiş olabileceği için yeniden alınır).
+    Depo hiç eşitlenmemişse ya da eşitlenen geçmiş son `history_days` günü
+    kapsamıyorsa o aralığın tamamı çekilir. Depodaki son tarih kullanılmaz:
+    depoya yerel olarak eklenen bugünün kapanışları, başarısız bir ilk
+    eşitlemeden sonra geçmişin hiç çekilmemesine yol açardı.
+    Eşitleme yarıda kesilirse depo ve işaretleri değiştirilmez. Çekilen satır sayısını döner.
+    """
+    if client is None:
+        client = get_client()
+
+    seed_from = pd.Timestamp(datetime.now() - timedelta(days=history_days)).normalize()
+    seeding = store.synced_through is None or store.seeded_from is None or store.seeded_from > seed_from
+    since = (seed_from if seeding else store.synced_through).strftime('%Y-%m-%d')
+
+    rows = []
+    offset = 0
+    while True:
+        try:
+            with METRICS.stage('store_sync'):
+                response = client.table(table_name) \
+                    .select('symbol,date,close') \
+                    .gte('date', since) \
+                    .order('date') \
+                    .order('symbol') \
+                    .range(offset, offset + SUPABASE_MAX_ROWS - 1) \
+                    .execute()
+        except Exception as e:
+            print(f"Price store sync error for {table_name} (offset {offset}): {e}")
+            return 0
+
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < SUPABASE_MAX_ROWS:
+            break
+        offset += SUPABASE_MAX_ROWS
+
+    synced = store.update((row['symbol'], row['date'], row['close']) for row in rows)
+    last_synced = max((str(row['date'])[:10] for row in rows), default=None) or store.synced_through
+    store.mark_synced(seed_from if seeding else store.seeded_from, last_synced)
+    return synced
+
+def load_cached_reference_prices(store, table_name, symbols, dates, client=None):
+    """
+    Referans fiyatları önce yerel depodan okur. Depoda eksiği olan semboller
+    için yalnızca onlar adına toplu DB sorgusu atılır.
+    """
+    clean_syms = [clean_symbol(s) for s in symbols]
+    prices = store.reference_prices(clean_syms, dates)
+
+    missing = [sym for sym in clean_syms
+               if any((sym, d.strftime('%Y-%m-%d')) not in prices for d in dates)]
+    if missing:
+        loaded = load_reference_prices(missing, dates, table_name, client=client)
+        # DB'den gelenler depoya da eklenir; eşitleme başarısız olsa bile ufuk hesapları bunları görür
+        store.update((sym, day, close) for (sym, day), close in loaded.items())
+        prices.update(loaded)
+    return prices
+
+def _reference_price(ref_prices, clean_sym, target_date, table_name):
+    """
+    Referans fiyatı önceden yüklenmiş sözlükten okur; sözlük yoksa DB'ye gider.
+    """
+    if ref_prices is None:
+        return get_db_price(clean_sym, target_date, table_name)
+    return ref_prices.get((clean_sym, target_date.strftime('%Y-%m-%d')))
+
+def _as_datetime(day):
+    return datetime.combine(day, datetime.min.time())
+
+def get_current_session(today):
+    """
+    Bugünün fiyatının ait olduğu seansı bulur.
+    Bugün seans günüyse bugündür; hafta sonu ya da tatilde son seanstır.
+    """
+    return _as_datetime(BIST_CALENDAR.session_on_or_before(today))
+
 def get_last_friday(today):
     """
-    Verilen tarihten önceki son Cuma gününü bulur.
-    Eğer bugün Cuma ise ve piyasa kapanmadıysa geçen haftanın Cuma'sını mı alır?
-    Genellikle 'Haftalık Değişim' için Pazartesi açılışı veya Cuma kapanışı baz alınır.
-    İstek: "Haftayı Pzt-Cuma olarak hesapla".
-    Bugün Pazartesi ise -> Referans Cuma.
-    Bugün Çarşamba ise -> Referans Cuma.
+    Haftalık değişim için referans seansı bulur: geçen haftanın son seansı.
+    "Haftayı Pzt-Cuma olarak hesapla" isteğine göre:
+    Bugün Pazartesi ise -> Referans geçen Cuma.
+    Bugün Çarşamba ise -> Referans geçen Cuma.
     Bugün Cuma ise -> Referans GEÇEN Cuma (böylece bu haftanın performansı olur).
+    Geçen haftanın Cuması tatilse ondan önceki son seans (ör. Perşembe) alınır.
     """
-    idx = (today.weekday() + 1) % 7 # Mon=0 -> ...
-    # Pazartesi=0, Salı=1, ... Cuma=4, ... Pazar=6
-    
-    # Cuma gününü bulmak için geriye gitmemiz gereken gün sayısı
-    # Eğer bugün Pazartesi (0) ise, Cuma (4) için 3 gün geri gitmeliyiz. (0-3 = -3 -> mod 7 = 4)
-    # Eğer bugün Cuma (4) ise, geçen haftanın Cuması için 7 gün geri gitmeliyiz.
-    
-    days_back = (today.weekday() - 4) % 7
-    if days_back == 0:
-        days_back = 7 # Bugün Cuma ise geçen Cuma'yı al
-    elif today.weekday() >= 5: # Cumartesi veya Pazar ise
-        days_back += 7 # Geçen haftanın Cumasını al (bugünün/dünün Cumasını değil)
-    
-    return today - timedelta(days=days_back)
+    return _as_datetime(BIST_CALENDAR.last_session_of_previous_week(get_current_session(today)))
 
 def get_previous_trading_day(today):
     """
-    Bir önceki iş gününü (basitçe) bulur.
-    Hafta sonlarını atlar.
+    Günlük değişim için referans seansı bulur: güncel seanstan önceki seans.
+    Hafta sonları ve resmi tatiller (trading_calendar) atlanır.
     """
-    days_back = 1
-    if today.weekday() == 0: # Pazartesi ise
-        days_back = 3 # Cuma'ya git
-    elif today.weekday() == 6: # Pazar ise
-        days_back = 2 # Cuma'ya git
-    
-    return today - timedelta(days=days_back)
+    return _as_datetime(BIST_CALENDAR.previous_session(get_current_session(today)))
+
+def _last_quotes(data, chunk):
+    """
+    yf.download çıktısından (tarih x sembol) her sembolün son geçerli kapanışını ve hacmini alır.
+    """
+    if not isinstance(data.columns, pd.MultiIndex):
+        # Tek sembollük indirmelerde kolonlar düz gelebilir
+        data = pd.concat({chunk[0]: data}, axis=1).swaplevel(axis=1)
+
+    closes = data['Close']
+    fields = data.columns.get_level_values(0)
+    volumes = data['Volume'] if 'Volume' in fields else None
+
+    rows = {}
+    for sym in closes.columns:
+        valid = closes[sym].dropna()
+        if valid.empty:
+            continue
+        vol = 0.0
+        if volumes is not None and sym in volumes.columns:
+            vol = volumes[sym].get(valid.index[-1], 0.0)
+        rows[sym] = (float(valid.iloc[-1]), float(vol) if pd.notna(vol) else 0.0)
 
-def fetch_and_calculate(symbol, clean_sym, history_table='bist_index_history'):
+    return pd.DataFrame.from_dict(rows, orient='index', columns=['Close', 'Volume'])
+
+def fetch_quotes(symbols, chunk_size=QUOTE_CHUNK_SIZE, downloader=None, limiter=None):
+    """
+    Tüm semboller için son kapanış ve hacmi toplu olarak çeker.
+    Semboller chunk_size'lık gruplara bölünür ve her grup tek bir çoklu-ticker
+    isteğiyle indirilir; böylece istek sayısı sembol sayısıyla değil chunk sayısıyla artar.
+    Chunk'lar sırayla indirilir (yf.download paylaşılan global durum kullandığı için
+    paralel çağrılara uygun değil); her chunk kendi içinde yfinance thread'leriyle iner.
+    Dönen tablo: index=sembol ('.IS' ekli), kolonlar=['Close', 'Volume'].
+    """
+    if downloader is None:
+        downloader = get_quotes().download
+    if limiter is None:
+        limiter = nullcontext()
+
+    symbols = list(dict.fromkeys(symbols))
+    frames = []
+    for i in range(0, len(symbols), chunk_size):
+        chunk = symbols[i:i + chunk_size]
+        try:
+            with limiter, METRICS.stage('quote_fetch'):
+                data = downloader(chunk, period="1d", group_by='column', progress=False)
+        except Exception as e:
+            print(f"Quote Download Error for chunk {i // chunk_size}: {e}")
+            continue
+
+        if data is None or data.empty:
+            continue
+        frames.append(_last_quotes(data, chunk))
+
+    if not frames:
+        return pd.DataFrame(columns=['Close', 'Volume'], dtype=float)
+    return pd.concat(frames)
+
+def fetch_and_calculate(symbol, clean_sym, history_table='bist_index_history', quotes=None, ref_prices=None, now=None,
+                        writer=None, limiter=None):
     try:
-        ticker = yf.Ticker(symbol)
-        # Sadece son fiyatı anlık alalım
-        todays_data = ticker.history(period="1d")
-        
-        if todays_data.empty:
-            return None
-            
-        current_price = float(todays_data['Close'].iloc[-1])
-        current_vol = float(todays_data['Volume'].iloc[-1]) if 'Volume' in todays_data.columns else 0
+        if quotes is not None:
+            # Toplu indirilen fiyat tablosundan oku
+            if symbol not in quotes.index:
+                return None
+            current_price = float(quotes.at[symbol, 'Close'])
+            current_vol = float(quotes.at[symbol, 'Volume'])
+        else:
+            # Sadece son fiyatı anlık alalım
+            with limiter or nullcontext(), METRICS.stage('quote_fetch'):
+                todays_data = get_quotes().history(symbol, period="1d")
+
+            if todays_data.empty:
+                return None
+
+            current_price = float(todays_data['Close'].iloc[-1])
+            current_vol = float(todays_data['Volume'].iloc[-1]) if 'Volume' in todays_data.columns else 0
         
-        now = datetime.now()
+        if now is None:
+            now = datetime.now()
         
-        # 1. Bugünü Veritabanına Kaydet
-        upsert_price(symbol, current_price, now, history_table)
+        # 1. Bugünü Veritabanına Kaydet (hafta sonu/tatilde son seansın tarihiyle)
+        upsert_price(symbol, current_price, get_current_session(now), history_table, writer)
         
         # 2. Geçmiş Verileri Veritabanından Çek
         # Günlük Değişim için Dün
         yesterday = get_previous_trading_day(now)
-        price_yesterday = get_db_price(clean_sym, yesterday, history_table)
+        price_yesterday = _reference_price(ref_prices, clean_sym, yesterday, history_table)
         
         # Haftalık Değişim için Geçen Cuma
         last_friday = get_last_friday(now)
-        price_last_friday = get_db_price(clean_sym, last_friday, history_table)
+        price_last_friday = _reference_price(ref_prices, clean_sym, last_friday, history_table)
+
+        # Yahoo'dan tamamlanan referanslar (çalıştırma günlüğünden devam edilirken yeniden yazılır)
+        fallback_history = {}
 
         # --- YALNIZCA HİSSELER İÇİN GEÇMİŞ VERİ DOLDURMA (FALLBACK) ---
         if (price_yesterday is None or price_last_friday is None) and history_table == 'bist_price_history':
             print(f"[{clean_sym}] DB'de eksik veri var, Yahoo Finance'den çekiliyor...")
-            hist_extra = ticker.history(period="1mo")
+            METRICS.incr('fallback_symbols')
+            with limiter or nullcontext(), METRICS.stage('fallback_fetch'):
+                hist_extra = get_quotes().history(symbol, period="1mo")
             if not hist_extra.empty:
                 # Tarihleri karşılaştırabilmek için index'i date tipine çevirelim
                 hist_extra.index = hist_extra.index.date
@@ -260,116 +641,837 @@ def fetch_and_calculate(symbol, clean_sym, history_table='bist_index_history'):
                 y_date = yesterday.date()
                 if price_yesterday is None and y_date in hist_extra.index:
                     price_yesterday = float(hist_extra.loc[y_date]['Close'])
-                    upsert_price(symbol, price_yesterday, yesterday, history_table)
+                    upsert_price(symbol, price_yesterday, yesterday, history_table, writer)
+                    fallback_history[y_date.strftime('%Y-%m-%d')] = price_yesterday
+                    if ref_prices is not None:
+                        ref_prices[(clean_sym, y_date.strftime('%Y-%m-%d'))] = price_yesterday
                     print(f"  - Dün ({y_date}) verisi Yahoo'dan çekildi ve kaydedildi.")
                 
                 # Geçen Cuma verisi eksikse doldur
                 f_date = last_friday.date()
                 if price_last_friday is None and f_date in hist_extra.index:
                     price_last_friday = float(hist_extra.loc[f_date]['Close'])
-                    upsert_price(symbol, price_last_friday, last_friday, history_table)
+                    upsert_price(symbol, price_last_friday, last_friday, history_table, writer)
+                    fallback_history[f_date.strftime('%Y-%m-%d')] = price_last_friday
+                    if ref_prices is not None:
+                        ref_prices[(clean_sym, f_date.strftime('%Y-%m-%d'))] = price_last_friday
                     print(f"  - Geçen Cuma ({f_date}) verisi Yahoo'dan çekildi ve kaydedildi.")
 
-        # Hesaplamalar
-        change_1d = 0
-        if price_yesterday and price_yesterday != 0:
-            change_1d = (current_price - price_yesterday) / price_yesterday * 100
-        
-        change_1w = 0
-        if price_last_friday and price_last_friday != 0:
-            change_1w = (current_price - price_last_friday) / price_last_friday * 100
-        
+        # Değişimler run_update'te depodaki geçmişten tüm ufuklar için hesaplanır (bkz. calculate_horizon_returns)
         return {
+            'price': current_price,
             'last_price': round(current_price, 2),
-            'change_1d': round(change_1d, 2),
-            'change_1w': round(change_1w, 2),
             'volume': f"{round(current_vol / 1_000_000, 1)}M",
             'price_yesterday': price_yesterday,
-            'price_last_friday': price_last_friday
+            'price_last_friday': price_last_friday,
+            'fallback_history': fallback_history
         }
 
     except Exception as e:
         print(f"Error for {symbol}: {e}")
+        METRICS.incr('symbol_errors')
         return None
 
 
 
-def main():
-    print(f"BIST Data Fetcher Started: {datetime.now()}")
+def get_reference_dates(now):
+    """
+    Her değişim ufku için referans tarihini döner.
+    Haftalık ufuklar 1, 2 ve 3 hafta önceki haftaların son seansı, aylık ufuklar
+    1 ve 3 takvim ayı önceki günde ya da öncesindeki son seanstır.
+    """
+    session = get_current_session(now)
+
+    def week_back(weeks):
+        return _as_datetime(BIST_CALENDAR.last_session_of_previous_week(session - timedelta(weeks=weeks)))
+
+    def months_back(months):
+        return _as_datetime(BIST_CALENDAR.session_on_or_before(session - pd.DateOffset(months=months)))
+
+    return {
+        '1d': get_previous_trading_day(now),
+        '1w': week_back(0),
+        '2w': week_back(1),
+        '3w': week_back(2),
+        '1m': months_back(1),
+        '3m': months_back(3),
+    }
+
+def calculate_horizon_returns(store, symbols, stats_list, now):
+    """
+    Güncel fiyatı olan tüm semboller için bütün ufuklardaki değişimleri
+    depodaki geçmişten tek bir vektörel geçişte hesaplar.
+    Dönen tablo: index=temiz sembol, kolonlar=HORIZONS.
+    """
+    prices = {clean_symbol(sym): stats['price'] for sym, stats in zip(symbols, stats_list) if stats}
+    return compute_returns(store.frame, pd.Series(prices, dtype=float), get_reference_dates(now))
+
+def calculate_index_breadth(membership, store, stock_changes, now):
+    """
+    Hisse getirileri ve depodaki son 1 aylık geçmişten tüm endeksler için
+    genişlik/katkı analizini hesaplar (bkz. index_analytics).
+    """
+    clean_syms = [clean_symbol(s) for s in membership.symbols]
+    session = pd.Timestamp(get_current_session(now))
+    month_start = pd.Timestamp(get_reference_dates(now)['1m'])
+
+    closes = store.frame.reindex(columns=clean_syms)
+    history = closes[(closes.index >= month_start) & (closes.index < session)]
+    if session in closes.index:
+        current = closes.loc[session].to_numpy(dtype=float)
+    else:
+        current = np.full(len(clean_syms), np.nan)
+    returns = stock_changes['1d'].reindex(clean_syms).to_numpy(dtype=float)
+
+    return compute_index_breadth(membership, returns, current, history.to_numpy(dtype=float))
+
+def _pct(value):
+    """
+    Yüzde değişimi DB'ye yazılacak hale getirir; hesaplanamayan değer None olur.
+    """
+    return None if pd.isna(value) else float(value)
+
+def _to_ticker(code):
+    """
+    Kullanıcının yazdığı kodu Yahoo sembolüne çevirir ('xbank' -> 'XBANK.IS').
+    """
+    code = code.strip().upper()
+    return code if code.endswith('.IS') else f"{code}.IS"
+
+def select_universe(membership, scope='all', index_codes=None, symbols=None):
+    """
+    Güncellenecek (endeksler, hisseler) listelerini döner.
+    index_codes verilirse o endeksler ve üyeleri, symbols verilirse yalnızca o
+    semboller seçilir; ikisi birlikte verilirse birleşimleri alınır. Hiçbiri
+    verilmezse tüm evren seçilir. scope 'indices' ya da 'stocks' ise sonuç
+    yalnızca o türe daraltılır.
+    """
+    if index_codes or symbols:
+        indices, stocks = [], []
+        for code in index_codes or []:
+            ticker = _to_ticker(code)
+            if ticker not in INDICES and ticker not in membership.index_pos:
+                raise ConfigError(f"Bilinmeyen endeks: {code}")
+            if ticker in INDICES:
+                indices.append(ticker)
+            stocks.extend(membership.members(ticker))
+        for sym in symbols or []:
+            ticker = _to_ticker(sym)
+            if ticker in INDICES:
+                indices.append(ticker)
+            else:
+                if ticker not in membership.symbol_pos:
+                    print(f"Warning: {clean_symbol(ticker)} is not in any index membership.")
+                stocks.append(ticker)
+        indices, stocks = list(dict.fromkeys(indices)), list(dict.fromkeys(stocks))
+    else:
+        indices, stocks = list(INDICES.keys()), list(membership.symbols)
+
+    if scope == 'indices':
+        stocks = []
+    elif scope == 'stocks':
+        indices = []
+    return indices, stocks
+
+def retry_failed(jobs, stats, process, refetch=None, attempts=RUN_RETRY_ATTEMPTS, delay=RUN_RETRY_DELAY,
+                 workers=FETCH_WORKERS, sleep=time.sleep):
+    """
+    Sonucu None olan işleri artan (üstel) beklemeyle en fazla `attempts` tur
+    yeniden dener; her turda yalnızca hâlâ eksik olanlar işlenir.
+    refetch verilirse her turdan önce eksik işlerle çağrılır (ör. fiyatları yeniden indirmek için).
+    stats listesi yerinde güncellenir; kurtarılan iş sayısını döner.
+    """
+    recovered = 0
+    for attempt in range(1, attempts + 1):
+        missing = [i for i, result in enumerate(stats) if not result]
+        if not missing:
+            break
+        wait = delay * 2 ** (attempt - 1)
+        print(f"Retry {attempt}/{attempts}: {len(missing)} symbol(s) after {wait:g}s...")
+        sleep(wait)
+        METRICS.incr('symbol_retries', len(missing))
+
+        pending = [jobs[i] for i in missing]
+        if refetch is not None:
+            refetch(pending)
+        for i, result in zip(missing, run_concurrently(process, pending, workers)):
+            if result:
+                stats[i] = result
+                recovered += 1
+
+    METRICS.incr('retry_recovered_symbols', recovered)
+    return recovered
+
+def run_update(workers=FETCH_WORKERS, rate=FETCH_RATE, max_in_flight=FETCH_MAX_IN_FLIGHT,
+               report_path=RUN_REPORT_PATH, prometheus_path=RUN_REPORT_PROMETHEUS,
+               journal_path=RUN_JOURNAL_PATH, retries=RUN_RETRY_ATTEMPTS, retry_delay=RUN_RETRY_DELAY,
+               scope='all', index_codes=None, symbols=None, max_dropped_share=RUN_MAX_DROPPED_SHARE):
+    """
+    Günlük güncelleme: fiyatları çeker, değişimleri hesaplar ve tabloları günceller.
+    scope/index_codes/symbols ile evrenin bir kısmı güncellenebilir (bkz. select_universe).
+    Sembol sonuçları hesaplandıkça çalıştırma günlüğüne yazılır; aynı seans günü
+    için yeniden başlatılan çalıştırma tamamlanmış sembolleri atlar. Sonuç
+    alınamayan semboller yayınlamadan önce `retries` tur yeniden denenir.
+    Sonda aşama ölçümlerini içeren çalıştırma raporunu yazar (bkz. metrics.py).
+    Yazılamayan batch varsa, hiçbir sembol yayınlanamadıysa ya da sonuç alınamayan
+    sembollerin oranı max_dropped_share'i aşarsa çalıştırma başarısız sayılır ve
+    günlük bir sonraki çalıştırma için saklanır. Çalıştırma başarılıysa True döner.
+    """
+    METRICS.reset()
+    print(f"BIST Data Fetcher Started: {datetime.now()} "
+          f"(workers: {workers}, rate: {rate}/s, in-flight: {max_in_flight})")
+    limiter = RateLimiter(rate=rate, max_in_flight=max_in_flight)
+    # Kimlik bilgisi eksikse ağa çıkmadan önce dur
+    get_client()
     
     results_indices = []
     results_stocks = []
-    
-    # --- ENDEKSLERİ İŞLE ---
+
+    now = datetime.now()
+
+    # --- HİSSE LİSTESİ ---
+    membership = load_membership(as_of=now)
+    print(f"Membership {membership.version}: {len(membership.indices)} indices, {len(membership.symbols)} stocks")
+    index_symbols, stock_symbols = select_universe(membership, scope, index_codes, symbols)
+    partial = len(index_symbols) < len(INDICES) or len(stock_symbols) < len(membership.symbols)
+    if partial:
+        print(f"Selective refresh: {len(index_symbols)} indices, {len(stock_symbols)} stocks")
+        # Kısmi çalıştırma tam çalıştırmanın günlüğünü ne kullanır ne de boşaltır
+        journal_path = None
+
+    all_symbols = index_symbols + stock_symbols
+    index_jobs = [('bist_index_history', sym) for sym in index_symbols]
+    stock_jobs = [('bist_price_history', sym) for sym in stock_symbols]
+
+    # --- ÇALIŞTIRMA GÜNLÜĞÜ ---
+    session = get_current_session(now)
+    journal = RunJournal(journal_path, session.strftime('%Y-%m-%d')) if journal_path else None
+    pending = [(table_name, sym) for table_name, sym in index_jobs + stock_jobs
+               if journal is None or journal.get(table_name, sym) is None]
+    if len(pending) < len(all_symbols):
+        print(f"Resuming run {session:%Y-%m-%d} from journal: {len(all_symbols) - len(pending)} symbols already done.")
+        METRICS.incr('journal_resumed_symbols', len(all_symbols) - len(pending))
+
+    # --- FİYATLARI TOPLU ÇEK ---
+    pending_symbols = [sym for _, sym in pending]
+    print(f"Downloading quotes for {len(pending_symbols)} symbols (chunk: {QUOTE_CHUNK_SIZE})...")
+    quotes = fetch_quotes(pending_symbols, limiter=limiter)
+
+    # --- REFERANS FİYATLARI TOPLU ÇEK ---
+    # fetch_and_calculate'in tam tarih eşleşmesi aradığı referanslar (dün, geçen Cuma)
+    ref_dates = [get_previous_trading_day(now), get_last_friday(now)]
+    # Yalnızca güncellenecek sembollerin tabloları için depo açılır
+    stores = {
+        table_name: PriceStore(os.path.join(PRICE_STORE_DIR, table_name))
+        for table_name, jobs in (('bist_index_history', index_jobs), ('bist_price_history', stock_jobs)) if jobs
+    }
+    for table_name, store in stores.items():
+        synced = sync_price_store(store, table_name)
+        print(f"Price store {table_name}: {synced} rows synced, last date {store.last_date()}")
+
+    refs = {
+        table_name: load_cached_reference_prices(stores[table_name], table_name,
+                                                 [sym for t, sym in pending if t == table_name], ref_dates)
+        for table_name in stores
+    }
+    print(f"Loaded {len(refs.get('bist_index_history', {}))} index and "
+          f"{len(refs.get('bist_price_history', {}))} stock reference prices.")
+
+    # Geçmiş fiyat yazımları sonda toplu yapılır
+    writer = HistoryWriter()
+
+    def process(job):
+        table_name, symbol = job
+        done = journal.get(table_name, symbol) if journal else None
+        if done is not None:
+            # Günlükten gelen sembolün henüz yazılmamış olabilecek geçmiş satırları tampona geri eklenir
+            writer.add(table_name, symbol, session, done['price'])
+            for day, close in done.get('fallback_history', {}).items():
+                writer.add(table_name, symbol, _parse_date(day), close)
+            return done
+
+        # Endeksler ve hisseler için veritabanı history kullanıyoruz
+        stats = fetch_and_calculate(symbol, clean_symbol(symbol), history_table=table_name,
+                                    quotes=quotes, ref_prices=refs[table_name], now=now, writer=writer,
+                                    limiter=limiter)
+        if stats and journal:
+            journal.append(table_name, symbol, stats)
+        return stats
+
+    def refetch(jobs):
+        # Toplu indirmede fiyatı gelmeyen semboller yeniden indirilir
+        nonlocal quotes
+        missing = [sym for _, sym in jobs if sym not in quotes.index]
+        if missing:
+            quotes = pd.concat([quotes, fetch_quotes(missing, limiter=limiter)])
+
+    # --- ENDEKSLERİ VE HİSSELERİ İŞLE ---
     print(f"Processing Indices...") 
-    for symbol, info in INDICES.items():
-        clean_sym = symbol.replace('.IS', '')
-        # Manuel DB Hesaplaması
-        stats = fetch_and_calculate(symbol, clean_sym, history_table='bist_index_history')
-        
+    index_stats = run_concurrently(process, index_jobs, workers)
+
+    print(f"Processing {len(stock_symbols)} stocks...")
+    stock_stats = run_concurrently(process, stock_jobs, workers)
+
+    # --- BAŞARISIZ SEMBOLLERİ YENİDEN DENE ---
+    all_stats = index_stats + stock_stats
+    if retries and not all(all_stats):
+        recovered = retry_failed(index_jobs + stock_jobs, all_stats, process, refetch,
+                                 attempts=retries, delay=retry_delay, workers=workers)
+        print(f"Retry pass recovered {recovered} symbol(s).")
+        index_stats, stock_stats = all_stats[:len(index_jobs)], all_stats[len(index_jobs):]
+    if journal:
+        journal.close()
+
+    # --- YEREL DEPOYU GÜNCELLE ---
+    # Bugünün kapanışları ve Yahoo'dan tamamlanan referanslar depoya eklenir
+    for table_name, store in stores.items():
+        store.update(writer.rows(table_name))
+        try:
+            store.save()
+        except OSError as e:
+            print(f"Price store write error for {table_name}: {e}")
+
+    # Fiyatı alınamayan ya da hata veren semboller yayınlanmaz
+    dropped = [clean_symbol(sym) for sym, stats in zip(all_symbols, index_stats + stock_stats) if not stats]
+    METRICS.incr('dropped_symbols', len(dropped))
+    METRICS.record('dropped_symbols', dropped)
+    if dropped:
+        print(f"{len(dropped)} symbol(s) dropped: {', '.join(dropped[:20])}{' ...' if len(dropped) > 20 else ''}")
+
+    # --- ÇOK UFUKLU DEĞİŞİMLER (VEKTÖREL) ---
+    with METRICS.stage('calculation'):
+        if index_symbols:
+            index_changes = calculate_horizon_returns(stores['bist_index_history'], index_symbols,
+                                                      index_stats, now)
+        if stock_symbols:
+            stock_changes = calculate_horizon_returns(stores['bist_price_history'], stock_symbols,
+                                                      stock_stats, now)
+
+    for symbol, stats in zip(index_symbols, index_stats):
+        clean_sym = clean_symbol(symbol)
+        info = INDICES[symbol]
         if stats:
-            print(f"{clean_sym}: {stats['last_price']} (1D: {stats['change_1d']}%, 1W: {stats['change_1w']}%) [Ref: {stats['price_yesterday']}, {stats['price_last_friday']}]")
+            changes = index_changes.loc[clean_sym]
+            print(f"{clean_sym}: {stats['last_price']} (1D: {_pct(changes['1d'])}%, 1W: {_pct(changes['1w'])}%) [Ref: {stats['price_yesterday']}, {stats['price_last_friday']}]")
             
             results_indices.append({
                 'code': clean_sym,
                 'name': info['name'],
                 'category': info['category'],
                 'last_price': stats['last_price'],
-                'change1d': stats['change_1d'],
-                'change1w': stats['change_1w'], # DB Hesaplı Manual
-                'change2w': 0,
-                'change3w': 0,
-                'change1m': 0,
-                'change3m': 0,
+                'change1d': _pct(changes['1d']),
+                'change1w': _pct(changes['1w']),
+                'change2w': _pct(changes['2w']),
+                'change3w': _pct(changes['3w']),
+                'change1m': _pct(changes['1m']),
+                'change3m': _pct(changes['3m']),
                 'volume': stats['volume'],
                 'updated_at': datetime.now().isoformat()
             })
-        time.sleep(0.5)
-
-    # --- HİSSELERİ İŞLE ---
-    unique_stocks = set()
-    stock_to_parents = {}
-    if 'CONSTITUENTS' in globals():
-        for idx_code, stock_list in CONSTITUENTS.items():
-            clean_idx = idx_code.replace('.IS', '')
-            for s in stock_list:
-                unique_stocks.add(s)
-                if s not in stock_to_parents: stock_to_parents[s] = []
-                if clean_idx not in stock_to_parents[s]: stock_to_parents[s].append(clean_idx)
-
-    print(f"Processing {len(unique_stocks)} stocks...")
-    for i, symbol in enumerate(list(unique_stocks)):
-        clean_sym = symbol.replace('.IS', '')
-        # Hisseler için de artık veritabanı history kullanıyoruz!
-        stats = fetch_and_calculate(symbol, clean_sym, history_table='bist_price_history')
-        
+
+    for symbol, stats in zip(stock_symbols, stock_stats):
+        clean_sym = clean_symbol(symbol)
         if stats:
+            changes = stock_changes.loc[clean_sym]
             results_stocks.append({
                 'symbol': clean_sym,
-                'parent_index': ",".join(stock_to_parents.get(symbol, [])),
+                'parent_index': ",".join(clean_symbol(code) for code in membership.parents(symbol)),
                 'price': stats['last_price'],
-                'change1d': stats['change_1d'],
-                'change1w': stats['change_1w'],
-                'change2w': 0, 
-                'change3w': 0,
-                'change1m': 0, # Şimdilik geçmiş olmadığı için 0
-                'change3m': 0, # Şimdilik geçmiş olmadığı için 0
+                'change1d': _pct(changes['1d']),
+                'change1w': _pct(changes['1w']),
+                'change2w': _pct(changes['2w']),
+                'change3w': _pct(changes['3w']),
+                'change1m': _pct(changes['1m']),
+                'change3m': _pct(changes['3m']),
                 'updated_at': datetime.now().isoformat()
             })
-        if i % 20 == 0: time.sleep(0.3)
+
+    # --- ENDEKS GENİŞLİK ANALİZİ ---
+    # Yalnızca bütün üyeleri bu çalıştırmada güncellenen endeksler yayınlanır
+    results_breadth = []
+    breadth = None
+    if stock_symbols:
+        with METRICS.stage('calculation'):
+            breadth = calculate_index_breadth(membership, stores['bist_price_history'], stock_changes, now)
+    refreshed = set(stock_symbols)
+    for code, row in (breadth.iterrows() if breadth is not None else ()):
+        if code not in INDICES or not refreshed.issuperset(membership.members(code)):
+            continue
+        results_breadth.append({
+            'code': clean_symbol(code),
+            'members': int(row['members']),
+            'advancers': int(row['advancers']),
+            'decliners': int(row['decliners']),
+            'unchanged': int(row['unchanged']),
+            'ew_change1d': _pct(round(row['ew_change'], 2)),
+            'median_change1d': _pct(round(row['median_change'], 2)),
+            'top_symbol': clean_symbol(row['top_symbol']),
+            'top_contribution': _pct(round(row['top_contribution'], 3)),
+            'bottom_symbol': clean_symbol(row['bottom_symbol']),
+            'bottom_contribution': _pct(round(row['bottom_contribution'], 3)),
+            'new_high_ratio': _pct(round(row['new_high_ratio'], 3)),
+            'new_low_ratio': _pct(round(row['new_low_ratio'], 3)),
+            'updated_at': datetime.now().isoformat()
+        })
 
     # --- KAYIT (UPSERT) ---
+    print(f"Writing {writer.pending()} history rows...")
+    failed = writer.flush()
+
+    if results_indices:
+        failed += upsert_batches('bist_indices', results_indices, 100)
+
+    if results_stocks:
+        failed += upsert_batches('bist_stocks', results_stocks, 100)
+
+    # Genişlik tablosu ayrıca oluşturulur (sql/bist_index_breadth.sql); yazılamaması
+    # endeks/hisse verisini bekletmesin diye çalıştırmayı başarısız saymaz
+    breadth_failed = 0
+    if results_breadth:
+        breadth_failed = upsert_batches('bist_index_breadth', results_breadth, 100)
+        if breadth_failed:
+            print(f"⚠️ Breadth could not be written ({breadth_failed} batch(es)); "
+                  f"is bist_index_breadth created? See sql/bist_index_breadth.sql")
+            METRICS.incr('breadth_failed_batches', breadth_failed)
+
+    published = len(results_indices) + len(results_stocks)
+    dropped_share = len(dropped) / len(all_symbols) if all_symbols else 0.0
+    ok = False
+    if failed:
+        print(f"❌ DB ERROR: {failed} batch(es) could not be written.")
+    elif all_symbols and not published:
+        print(f"❌ NO DATA: none of the {len(all_symbols)} symbols could be published.")
+    elif dropped_share > max_dropped_share:
+        print(f"❌ TOO MANY DROPPED: {len(dropped)}/{len(all_symbols)} symbols ({dropped_share:.0%}) dropped, "
+              f"limit is {max_dropped_share:.0%}.")
+    else:
+        ok = True
+        print(f"✅ SUCCESS: Data (Indices, Stocks{'' if breadth_failed else ' & Breadth'}) updated successfully.")
+        # Her şey yayınlandı; aynı gün yapılacak yeni bir çalıştırma baştan başlasın
+        if journal:
+            journal.clear()
+
+    METRICS.incr('symbols_total', len(all_symbols))
+    METRICS.incr('symbols_published', published)
+    write_run_report(report_path, prometheus_path, command='update', status='ok' if ok else 'failed',
+                     failed_batches=failed, dropped_share=round(dropped_share, 4))
+    return ok
+
+def write_run_report(report_path, prometheus_path=None, **extra):
+    """
+    Ölçümleri JSON (ve verilmişse Prometheus) dosyasına yazar.
+    Rapor yazılamaması çalıştırmayı başarısız saymaz.
+    """
     try:
-        if results_indices:
-            supabase.table('bist_indices').upsert(results_indices).execute()
-        
-        if results_stocks:
-            for i in range(0, len(results_stocks), 100):
-                supabase.table('bist_stocks').upsert(results_stocks[i:i + 100]).execute()
-        
-        print(f"✅ SUCCESS: Data (Indices & Stocks) updated successfully.")
-    except Exception as e:
-        print(f"❌ DB ERROR: {e}")
+        METRICS.write(report_path, prometheus_path, **extra)
+    except OSError as e:
+        print(f"Run report write error: {e}")
+        return
+    if report_path:
+        print(f"Run report written to {report_path}")
+
+class SystemClock:
+    """
+    Daemon'un kullandığı saat: İstanbul saatini verir ve durdurma sinyaline
+    duyarlı bekler. Testlerde aynı arayüze sahip sahte bir saatle değiştirilebilir.
+    """
+
+    def now(self):
+        return datetime.now(MARKET_TZ).replace(tzinfo=None)
+
+    def wait(self, seconds, stop_event):
+        """
+        En fazla `seconds` saniye bekler; durdurma istenirse True döner.
+        """
+        return stop_event.wait(max(0.0, seconds))
+
+class RefreshDaemon:
+    """
+    BIST seans saatlerinde bellekte kalıp her `interval_minutes` dakikada
+    fiyatları yeniler. Supabase istemcisi, üyelikler, fiyat depoları ve
+    referans tarihleri seans başına bir kez yüklenir; her turda yalnızca fiyatı
+    değişen semboller yeniden hesaplanır ve sadece fiyat/değişim alanları yayınlanır.
+    Geçmiş (history) tabloları günlük çalıştırmaya bırakılır.
+    """
+
+    def __init__(self, interval_minutes=DAEMON_INTERVAL_MINUTES, clock=None, downloader=None,
+                 client=None, limiter=None, calendar=None):
+        self.interval = interval_minutes * 60
+        self.clock = clock or SystemClock()
+        self.downloader = downloader
+        self.client = client if client is not None else get_client()
+        self.limiter = limiter
+        self.calendar = calendar if calendar is not None else BIST_CALENDAR
+        self.stop_event = threading.Event()
+
+        self.session = None
+        self.membership = None
+        self.stores = {}
+        self.ref_dates = None
+        self.last_prices = {}
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+    def load(self, now):
+        """
+        Seans başında (ya da ilk turda) üyelikleri ve fiyat depolarını yükler.
+        """
+        self.session = now.date()
+        self.membership = load_membership(as_of=now)
+        self.stores = {}
+        for table_name in ('bist_index_history', 'bist_price_history'):
+            store = PriceStore(os.path.join(PRICE_STORE_DIR, table_name))
+            sync_price_store(store, table_name, client=self.client)
+            self.stores[table_name] = store
+        self.ref_dates = get_reference_dates(now)
+        self.last_prices = {}
+        print(f"Daemon loaded session {self.session}: {len(self.membership.symbols)} stocks, "
+              f"membership {self.membership.version}")
+
+    def _changed(self, quotes, symbols):
+        changed = {}
+        for sym in symbols:
+            if sym not in quotes.index:
+                continue
+            price = float(quotes.at[sym, 'Close'])
+            if self.last_prices.get(sym) != price:
+                changed[sym] = price
+        return changed
+
+    def refresh(self, now):
+        """
+        Tek bir yenileme turu. Yayınlanan satır sayısını döner.
+        """
+        indices = list(INDICES.keys())
+        stocks = self.membership.symbols
+        quotes = fetch_quotes(indices + stocks, downloader=self.downloader, limiter=self.limiter)
+        updated_at = datetime.now().isoformat()
+
+        index_prices = self._changed(quotes, indices)
+        stock_prices = self._changed(quotes, stocks)
+
+        rows_indices = []
+        if index_prices:
+            changes = compute_returns(self.stores['bist_index_history'].frame,
+                                      pd.Series({clean_symbol(s): p for s, p in index_prices.items()}, dtype=float),
+                                      self.ref_dates)
+            for sym, price in index_prices.items():
+                row = changes.loc[clean_symbol(sym)]
+                rows_indices.append({
+                    'code': clean_symbol(sym),
+                    'last_price': round(price, 2),
+                    **{f'change{h}': _pct(row[h]) for h in changes.columns},
+                    'volume': f"{round(float(quotes.at[sym, 'Volume']) / 1_000_000, 1)}M",
+                    'updated_at': updated_at
+                })
+
+        rows_stocks = []
+        if stock_prices:
+            changes = compute_returns(self.stores['bist_price_history'].frame,
+                                      pd.Series({clean_symbol(s): p for s, p in stock_prices.items()}, dtype=float),
+                                      self.ref_dates)
+            for sym, price in stock_prices.items():
+                row = changes.loc[clean_symbol(sym)]
+                rows_stocks.append({
+                    'symbol': clean_symbol(sym),
+                    'price': round(price, 2),
+                    **{f'change{h}': _pct(row[h]) for h in changes.columns},
+                    'updated_at': updated_at
+                })
+
+        failed = 0
+        if rows_indices:
+            failed += upsert_batches('bist_indices', rows_indices, 100, client=self.client)
+        if rows_stocks:
+            failed += upsert_batches('bist_stocks', rows_stocks, 100, client=self.client)
+
+        # Yalnızca yazılabilen fiyatlar "yayınlandı" sayılır; hata olursa bir sonraki turda tekrar denenir
+        if not failed:
+            self.last_prices.update(index_prices)
+            self.last_prices.update(stock_prices)
+
+        print(f"[{now:%H:%M}] Refreshed: {len(rows_indices)} indices, {len(rows_stocks)} stocks changed"
+              + (f", {failed} batch(es) failed" if failed else ""))
+        return len(rows_indices) + len(rows_stocks)
+
+    def seconds_until_next_open(self, now):
+        hours = self.calendar.session_hours(now)
+        if hours and now < hours[0]:
+            return (hours[0] - now).total_seconds()
+        open_at, _ = self.calendar.session_hours(self.calendar.next_session(now))
+        return (open_at - now).total_seconds()
+
+    def run(self):
+        """
+        Durdurulana kadar (SIGINT/SIGTERM ya da stop()) seans saatlerinde yeniler,
+        seans dışında bir sonraki açılışa kadar bekler.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+
+        print(f"Refresh daemon started (every {self.interval / 60:g} min).")
+        while not self.stop_event.is_set():
+            now = self.clock.now()
+            hours = self.calendar.session_hours(now)
+
+            if hours and hours[0] <= now <= hours[1]:
+                if self.session != now.date():
+                    self.load(now)
+                try:
+                    self.refresh(now)
+                except Exception as e:
+                    print(f"Refresh error: {e}")
+                # Son tur tam kapanış anına denk getirilir; böylece kapanış fiyatları da yayınlanır
+                wait = min(self.interval, max(1.0, (hours[1] - now).total_seconds()))
+            else:
+                wait = self.seconds_until_next_open(now)
+                print(f"Market closed, sleeping {wait / 60:.0f} min until next session.")
+
+            if self.clock.wait(wait, self.stop_event):
+                break
+
+        print("Refresh daemon stopped.")
+
+def _download_history(downloader, chunk, start, end):
+    """
+    Bir chunk için günlük OHLCV verisini indirir.
+    Dönen sözlük: sembol -> (tarih x ['Open', 'High', 'Low', 'Close', 'Volume']) DataFrame
+    """
+    data = downloader(chunk, start=start.strftime('%Y-%m-%d'),
+                      end=(end + timedelta(days=1)).strftime('%Y-%m-%d'),
+                      group_by='column', progress=False)
+    if data is None or data.empty:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        data = pd.concat({chunk[0]: data}, axis=1).swaplevel(axis=1)
+
+    frames = {}
+    for sym in chunk:
+        if sym not in data.columns.get_level_values(1):
+            continue
+        frame = data.xs(sym, axis=1, level=1).dropna(subset=['Close'])
+        if not frame.empty:
+            frames[sym] = frame
+    return frames
+
+def _load_checkpoint(path, start, end):
+    """
+    Aynı tarih aralığı için daha önce tamamlanmış sembolleri döner.
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return set()
+
+    if checkpoint.get('start') != start.strftime('%Y-%m-%d') or checkpoint.get('end') != end.strftime('%Y-%m-%d'):
+        print(f"Checkpoint {path} is for a different date range, starting over.")
+        return set()
+    return set(checkpoint.get('done', []))
+
+def _checkpoint_end(path, start):
+    """
+    Aynı başlangıçla yarıda kalmış bir backfill varsa onun bitiş tarihini döner.
+    Bitiş tarihi verilmeden yeniden çalıştırılan backfill başka bir günde de
+    aynı aralıkla devam edebilsin diye kullanılır.
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if checkpoint.get('start') != start.strftime('%Y-%m-%d') or checkpoint.get('complete') or not checkpoint.get('end'):
+        return None
+    return _parse_date(checkpoint['end'])
+
+def _save_checkpoint(path, start, end, done, complete=False):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d'),
+                   'done': sorted(done), 'complete': complete}, f)
+    os.replace(tmp_path, path)
+
+def backfill(start, end=None, chunk_size=BACKFILL_CHUNK_SIZE, batch_size=BACKFILL_BATCH_SIZE,
+             checkpoint_path=BACKFILL_CHECKPOINT, fields=BACKFILL_FIELDS, downloader=None,
+             client=None, limiter=None, report_path=None, prometheus_path=None):
+    """
+    INDICES ve [start, end] aralığının herhangi bir gününde endekste olan tüm
+    hisseler için bu aralıktaki günlük OHLCV verisini history tablolarına yazar.
+    Semboller chunk chunk indirilir ve her chunk büyük batch'ler halinde yazılıp
+    bellekten atılır. Tamamlanan chunk'lar checkpoint dosyasına işlenir; yarıda
+    kesilen bir backfill aynı aralıkla tekrar çalıştırıldığında kaldığı yerden devam eder.
+    end verilmezse yarıda kalan aynı başlangıçlı backfill'in bitiş tarihi, o da
+    yoksa bugün kullanılır; bitiş tarihi checkpoint'e yazılır.
+    """
+    if end is None:
+        end = _checkpoint_end(checkpoint_path, start)
+        if end is not None:
+            print(f"Resuming unfinished backfill with end date {end:%Y-%m-%d} from {checkpoint_path}.")
+        else:
+            end = datetime.now()
+    if downloader is None:
+        downloader = get_quotes().download
+    if limiter is None:
+        limiter = nullcontext()
+    if client is None:
+        client = get_client()
+
+    METRICS.reset()
+    # Aralıkta endeksten çıkarılan hisselerin geçmişi de yüklenir
+    membership = load_membership_between(start, end)
+    jobs = [('bist_index_history', list(INDICES.keys())), ('bist_price_history', membership.symbols)]
+    stores = {table_name: PriceStore(os.path.join(PRICE_STORE_DIR, table_name)) for table_name, _ in jobs}
+
+    done = _load_checkpoint(checkpoint_path, start, end)
+    total = sum(len(symbols) for _, symbols in jobs)
+    print(f"Backfill {start:%Y-%m-%d} -> {end:%Y-%m-%d}: {total} symbols, {len(done)} already done.")
+
+    failed_chunks = 0
+    for table_name, symbols in jobs:
+        pending = [sym for sym in symbols if sym not in done]
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            try:
+                with limiter, METRICS.stage('history_fetch'):
+                    frames = _download_history(downloader, chunk, start, end)
+            except Exception as e:
+                print(f"Backfill Download Error for {table_name} chunk {chunk[0]}..{chunk[-1]}: {e}")
+                failed_chunks += 1
+                continue
+
+            rows = []
+            for sym, frame in frames.items():
+                for day, values in frame.iterrows():
+                    row = {'symbol': clean_symbol(sym), 'date': day.strftime('%Y-%m-%d')}
+                    for field in fields:
+                        value = values.get(field.capitalize())
+                        row[field] = None if pd.isna(value) else float(value)
+                    rows.append(row)
+
+            if upsert_batches(table_name, rows, batch_size, client=client):
+                failed_chunks += 1
+                continue
+
+            stores[table_name].update((row['symbol'], row['date'], row['close']) for row in rows if 'close' in row)
+            stores[table_name].save()
+            done.update(chunk)
+            METRICS.incr('rows_written', len(rows))
+            _save_checkpoint(checkpoint_path, start, end, done)
+            print(f"[{table_name}] {len(done)}/{total} symbols, {len(rows)} rows written.")
+
+    if failed_chunks:
+        print(f"❌ Backfill finished with {failed_chunks} failed chunk(s); run again to resume.")
+    else:
+        _save_checkpoint(checkpoint_path, start, end, done, complete=True)
+        print(f"✅ Backfill completed.")
+    write_run_report(report_path, prometheus_path, command='backfill', status='failed' if failed_chunks else 'ok',
+                     failed_chunks=failed_chunks, start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'))
+    return failed_chunks
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def _parse_symbols(value):
+    return [s for s in (part.strip() for part in value.split(',')) if s]
+
+def _add_selection_args(parser, prefix=''):
+    """
+    Seçimli güncelleme seçenekleri (varsayılan komut, update, indices ve stocks için).
+    """
+    parser.add_argument('--index', dest=f'{prefix}index_codes', action='append', default=None, metavar='CODE',
+                        help="Yalnızca bu endeks ve üyeleri, ör. XBANK (birden fazla verilebilir)")
+    parser.add_argument('--symbols', dest=f'{prefix}symbols', type=_parse_symbols, default=None, metavar='SYMBOLS',
+                        help="Yalnızca bu semboller, virgülle ayrılmış, ör. THYAO,GARAN,XU030")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="BIST endeks ve hisse verilerini günceller.")
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS,
+                        help="Aynı anda işlenecek sembol sayısı (env: FETCH_WORKERS)")
+    parser.add_argument('--rate', type=float, default=FETCH_RATE,
+                        help="Saniyede en fazla Yahoo isteği, 0 = sınırsız (env: FETCH_RATE)")
+    parser.add_argument('--max-in-flight', type=int, default=FETCH_MAX_IN_FLIGHT,
+                        help="Aynı anda açık en fazla Yahoo isteği (env: FETCH_MAX_IN_FLIGHT)")
+    parser.add_argument('--report', default=RUN_REPORT_PATH,
+                        help="JSON çalıştırma raporu, boş = yazılmaz (env: RUN_REPORT_PATH)")
+    parser.add_argument('--prometheus', default=RUN_REPORT_PROMETHEUS,
+                        help="Prometheus metin dosyası, boş = yazılmaz (env: RUN_REPORT_PROMETHEUS)")
+    parser.add_argument('--journal', default=RUN_JOURNAL_PATH,
+                        help="Çalıştırma günlüğü, boş = kapalı (env: RUN_JOURNAL_PATH)")
+    parser.add_argument('--retries', type=int, default=RUN_RETRY_ATTEMPTS,
+                        help="Sonuç alınamayan semboller için yeniden deneme turu (env: RUN_RETRY_ATTEMPTS)")
+    parser.add_argument('--retry-delay', type=float, default=RUN_RETRY_DELAY,
+                        help="İlk yeniden deneme öncesi bekleme, saniye; her turda iki katına çıkar (env: RUN_RETRY_DELAY)")
+    parser.add_argument('--max-dropped', type=float, default=RUN_MAX_DROPPED_SHARE,
+                        help="Sonuç alınamayan sembollerin izin verilen en yüksek oranı, 0-1 (env: RUN_MAX_DROPPED_SHARE)")
+
+    _add_selection_args(parser)
+    # Alt komuttaki seçenekler ayrı tutulup komuttan önce verilenlerle birleştirilir
+    selection = argparse.ArgumentParser(add_help=False)
+    _add_selection_args(selection, prefix='command_')
+
+    sub = parser.add_subparsers(dest='command')
+    sub.add_parser('update', parents=[selection], help="Endeks ve hisseleri günceller (varsayılan komut)")
+    sub.add_parser('indices', parents=[selection], help="Yalnızca endeksleri günceller")
+    sub.add_parser('stocks', parents=[selection], help="Yalnızca hisseleri (ve genişlik analizini) günceller")
+
+    p_backfill = sub.add_parser('backfill', help="Geçmiş günlük verileri history tablolarına yükler")
+    p_backfill.add_argument('--start', type=_parse_date, required=True, help="Başlangıç tarihi (YYYY-MM-DD)")
+    p_backfill.add_argument('--end', type=_parse_date, default=None, help="Bitiş tarihi (YYYY-MM-DD), varsayılan bugün")
+    p_backfill.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE,
+                            help="Tek indirmedeki sembol sayısı (env: BACKFILL_CHUNK_SIZE)")
+    p_backfill.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE,
+                            help="Tek upsert'teki satır sayısı (env: BACKFILL_BATCH_SIZE)")
+    p_backfill.add_argument('--checkpoint', default=BACKFILL_CHECKPOINT,
+                            help="İlerleme dosyası (env: BACKFILL_CHECKPOINT)")
+    p_backfill.add_argument('--fields', default=",".join(BACKFILL_FIELDS),
+                            help="Yazılacak kolonlar (varsayılan 'close'); 'open,high,low,close,volume' "
+                                 "için history tablolarında bu kolonlar olmalı")
+
+    p_daemon = sub.add_parser('daemon', help="Seans saatlerinde fiyatları periyodik olarak yeniler")
+    p_daemon.add_argument('--interval', type=float, default=DAEMON_INTERVAL_MINUTES,
+                          help="Yenileme aralığı, dakika (env: DAEMON_INTERVAL_MINUTES)")
+
+    args = parser.parse_args(argv)
+    for name in ('index_codes', 'symbols'):
+        extra = vars(args).pop(f'command_{name}', None)
+        if extra:
+            setattr(args, name, (getattr(args, name) or []) + extra)
+    if args.command in ('backfill', 'daemon') and (args.index_codes or args.symbols):
+        parser.error(f"--index/--symbols cannot be used with '{args.command}'")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        return _run_command(args)
+    except ConfigError as e:
+        print(f"Hata: {e}")
+        return 2
+
+def _run_command(args):
+    if args.command == 'backfill':
+        limiter = RateLimiter(rate=args.rate, max_in_flight=args.max_in_flight)
+        fields = tuple(f.strip().lower() for f in args.fields.split(',') if f.strip())
+        failed = backfill(args.start, args.end, chunk_size=args.chunk_size, batch_size=args.batch_size,
+                          checkpoint_path=args.checkpoint, fields=fields, limiter=limiter,
+                          report_path=args.report, prometheus_path=args.prometheus)
+        return 1 if failed else 0
+
+    if args.command == 'daemon':
+        limiter = RateLimiter(rate=args.rate, max_in_flight=args.max_in_flight)
+        RefreshDaemon(interval_minutes=args.interval, limiter=limiter).run()
+        return 0
+
+    scope = args.command if args.command in ('indices', 'stocks') else 'all'
+    ok = run_update(workers=args.workers, rate=args.rate, max_in_flight=args.max_in_flight,
+                    report_path=args.report, prometheus_path=args.prometheus,
+                    journal_path=args.journal, retries=args.retries, retry_delay=args.retry_delay,
+                    scope=scope, index_codes=args.index_codes, symbols=args.symbols,
+                    max_dropped_share=args.max_dropped)
+    return 0 if ok else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
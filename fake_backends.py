@@ -0,0 +1,263 @@
+"""
+Ağ erişimi olmadan çalıştırmak için sahte arka uçlar.
+
+FakeSupabase:    Supabase istemcisinin kullandığımız kısmını (table().select()
+                 .eq()/.in_()/.gte()... .upsert() .execute()) bellekte taklit eder.
+SyntheticQuotes: yfinance yerine deterministik sentetik fiyatlar üretir.
+
+İkisi de uç nokta başına çağrı sayar ve yapay gecikme/hata oranı eklenebilir.
+data_fetcher.set_backends(client=..., quotes=...) ile takılır.
+"""
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+def _row_key(row):
+    if 'date' in row:
+        return (row.get('symbol'), str(row['date'])[:10])
+    if 'code' in row:
+        return row['code']
+    return row.get('symbol')
+
+
+_OPERATORS = {
+    'eq': lambda v, x: v == x,
+    'in': lambda v, x: v in x,
+    'gt': lambda v, x: v > x,
+    'gte': lambda v, x: v >= x,
+    'lt': lambda v, x: v < x,
+    'lte': lambda v, x: v <= x,
+}
+
+
+def _matches(row, filters):
+    for op, column, value in filters:
+        v = row.get(column)
+        if v is None or not _OPERATORS[op](v, value):
+            return False
+    return True
+
+
+class _Query:
+    def __init__(self, db, table_name):
+        self.db = db
+        self.table_name = table_name
+        self.operation = 'select'
+        self.columns = None
+        self.filters = []
+        self.order_by = []
+        self.bounds = None
+        self.rows = None
+
+    def select(self, columns='*'):
+        self.operation = 'select'
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    def upsert(self, rows, **kwargs):
+        self.operation = 'upsert'
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def _filter(self, op, column, value):
+        self.filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, frozenset(values))
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def limit(self, count):
+        self.bounds = (0, count - 1)
+        return self
+
+    def execute(self):
+        return self.db._execute(self)
+
+
+class FakeSupabase:
+    """
+    Bellek içi tablo deposu. Her tablo satırları birincil anahtara göre tutar:
+    history tabloları (symbol, date), diğerleri code ya da symbol.
+    upsert mevcut satırı yalnızca verilen kolonlarla günceller (PostgREST gibi).
+    Sorgular da Supabase gibi en fazla max_rows satır döner.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, max_rows=1000, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_rows = max_rows
+        self.tables = {}
+        self.calls = Counter()
+        # Sayfalı okumalarda aynı sorgu her sayfa için yeniden süzülüp sıralanmasın
+        self._versions = Counter()
+        self._cache = {}
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def table(self, table_name):
+        return _Query(self, table_name)
+
+    def reset_counts(self):
+        self.calls = Counter()
+
+    def seed(self, table_name, rows):
+        """
+        Çağrı saymadan tabloya satır ekler (benchmark hazırlığı için).
+        """
+        with self._lock:
+            table = self.tables.setdefault(table_name, {})
+            for row in rows:
+                table[_row_key(row)] = dict(row)
+            self._versions[table_name] += 1
+
+    def _execute(self, query):
+        endpoint = f"{query.table_name}.{query.operation}"
+        with self._lock:
+            self.calls[endpoint] += 1
+            fail = self.failure_rate and self._rng.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError(f"synthetic failure on {endpoint}")
+
+        with self._lock:
+            table = self.tables.setdefault(query.table_name, {})
+            if query.operation == 'upsert':
+                for row in query.rows:
+                    table.setdefault(_row_key(row), {}).update(row)
+                self._versions[query.table_name] += 1
+                return _Response([dict(r) for r in query.rows])
+
+            key = (query.table_name, self._versions[query.table_name],
+                   tuple(query.filters), tuple(query.order_by))
+            rows = self._cache.get(key)
+            if rows is None:
+                rows = [row for row in table.values() if _matches(row, query.filters)]
+                for column, desc in reversed(query.order_by):
+                    rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+                self._cache = {key: rows}
+
+        start, end = query.bounds if query.bounds else (0, self.max_rows - 1)
+        rows = rows[start:min(end + 1, start + self.max_rows)]
+        if query.columns:
+            rows = [{c: row.get(c) for c in query.columns} for row in rows]
+        return _Response([dict(r) for r in rows])
+
+
+_PERIOD_SESSIONS = {'1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252}
+
+
+class SyntheticQuotes:
+    """
+    yfinance yerine geçen deterministik fiyat üreticisi.
+    Aynı sembol ve gün için her zaman aynı fiyatı üretir; böylece DB'ye
+    tohumlanan geçmiş ile indirilen güncel fiyatlar tutarlıdır.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, missing_rate=0.0, seed=0, today=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.missing_rate = missing_rate
+        self.today = pd.Timestamp(today or datetime.now().date()).normalize()
+        self.calls = Counter()
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def reset_counts(self):
+        self.calls = Counter()
+
+    def _call(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+            fail = self.failure_rate and self._rng.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError(f"synthetic failure on {endpoint}")
+
+    def _dates(self, period=None, start=None, end=None):
+        if start is not None:
+            end = pd.Timestamp(end) - timedelta(days=1) if end is not None else self.today
+            return pd.bdate_range(start, min(pd.Timestamp(end), self.today))
+        return pd.bdate_range(end=self.today, periods=_PERIOD_SESSIONS.get(period or '1mo', 21))
+
+    def prices(self, symbol, dates):
+        """
+        Sembol ve günlerden türetilen kapanış fiyatları.
+        """
+        seed = zlib.crc32(symbol.encode())
+        base = 10 + seed % 490
+        phase = (seed % 1000) / 1000 * 2 * np.pi
+        ordinals = np.array([d.toordinal() for d in dates], dtype=float)
+        return base * (1 + 0.1 * np.sin(ordinals / 9 + phase) + 0.02 * np.sin(ordinals * 1.7 + phase))
+
+    def _frame(self, symbol, dates):
+        close = self.prices(symbol, dates)
+        return pd.DataFrame({
+            'Open': close * 0.995, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+            'Volume': np.full(len(dates), 1_000_000.0),
+        }, index=dates)
+
+    def download(self, tickers, period=None, start=None, end=None, **kwargs):
+        self._call('download')
+        tickers = tickers.split() if isinstance(tickers, str) else list(tickers)
+        dates = self._dates(period, start, end)
+        frames = {}
+        for sym in tickers:
+            if self.missing_rate and self._rng.random() < self.missing_rate:
+                continue
+            frames[sym] = self._frame(sym, dates)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+    def history(self, symbol, period='1mo', start=None, end=None, **kwargs):
+        self._call('history')
+        return self._frame(symbol, self._dates(period, start, end))
+
+
+def seed_history(db, quotes, table_name, symbols, sessions, clean=lambda s: s.replace('.IS', '')):
+    """
+    Son `sessions` iş gününün (bugün hariç) kapanışlarını sahte DB'ye tohumlar.
+    """
+    dates = pd.bdate_range(end=quotes.today - timedelta(days=1), periods=sessions)
+    rows = []
+    for sym in symbols:
+        for day, close in zip(dates, quotes.prices(sym, dates)):
+            rows.append({'symbol': clean(sym), 'date': day.strftime('%Y-%m-%d'), 'close': float(close)})
+    db.seed(table_name, rows)
+    return len(rows)
@@ -0,0 +1,85 @@
+"""
+Endeks genişlik (breadth) ve katkı analizleri.
+
+Hisse getirileri hesaplandıktan sonra, üyelik matrisi (endeks x hisse) ile
+getiri vektörü üzerinden tüm endeksler için tek bir vektörel geçişte:
+yükselen/düşen/değişmeyen sayıları, eşit ağırlıklı ve medyan getiri,
+en çok yükselten/düşüren üye ve 1 aylık zirve/dipteki üye oranı hesaplanır.
+"""
+import numpy as np
+import pandas as pd
+
+BREADTH_COLUMNS = [
+    'members', 'advancers', 'decliners', 'unchanged',
+    'ew_change', 'median_change',
+    'top_symbol', 'top_contribution', 'bottom_symbol', 'bottom_contribution',
+    'new_high_ratio', 'new_low_ratio',
+]
+
+
+def compute_index_breadth(membership, returns, current, history):
+    """
+    membership: Membership (matrix: endeks x hisse, boolean)
+    returns:    hisse getirileri (%), membership.symbols sırasıyla hizalı, NaN = yok
+    current:    güncel fiyatlar, membership.symbols sırasıyla hizalı
+    history:    son 1 ayın kapanışları (tarih x hisse), bugün hariç
+
+    Katkı, eşit ağırlıkta üyenin getirisinin endeks getirisine payıdır
+    (getiri / veri olan üye sayısı).
+    Dönen tablo: index=endeks kodu, kolonlar=BREADTH_COLUMNS.
+    Verisi olan üyesi bulunmayan endeksler tabloya girmez.
+    """
+    matrix = membership.matrix
+    returns = np.asarray(returns, dtype=float)
+    current = np.asarray(current, dtype=float)
+    history = np.asarray(history, dtype=float).reshape(-1, len(membership.symbols))
+
+    valid = matrix & ~np.isnan(returns)
+    counts = valid.sum(axis=1)
+    masked = np.where(valid, returns, np.nan)
+
+    advancers = (valid & (returns > 0)).sum(axis=1)
+    decliners = (valid & (returns < 0)).sum(axis=1)
+    unchanged = counts - advancers - decliners
+
+    has_data = counts > 0
+    ew_change = membership.mean(returns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        top_pos = np.where(valid, returns, -np.inf).argmax(axis=1)
+        bottom_pos = np.where(valid, returns, np.inf).argmin(axis=1)
+        top_contribution = returns[top_pos] / counts
+        bottom_contribution = returns[bottom_pos] / counts
+
+    median_change = np.full(len(counts), np.nan)
+    if has_data.any():
+        median_change[has_data] = np.nanmedian(masked[has_data], axis=1)
+
+    # 1 aylık zirve/dip: güncel fiyat pencere içindeki en yüksek/en düşük kapanışı geçti mi
+    if len(history):
+        window_valid = ~np.isnan(history).all(axis=0)
+        high = np.where(window_valid, np.where(np.isnan(history), -np.inf, history).max(axis=0), np.nan)
+        low = np.where(window_valid, np.where(np.isnan(history), np.inf, history).min(axis=0), np.nan)
+    else:
+        high = low = np.full(len(membership.symbols), np.nan)
+    comparable = matrix & ~np.isnan(current) & ~np.isnan(high)
+    n_comparable = comparable.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        new_high_ratio = np.where(n_comparable > 0, (comparable & (current >= high)).sum(axis=1) / n_comparable, np.nan)
+        new_low_ratio = np.where(n_comparable > 0, (comparable & (current <= low)).sum(axis=1) / n_comparable, np.nan)
+
+    symbols = np.array(membership.symbols, dtype=object)
+    frame = pd.DataFrame({
+        'members': counts,
+        'advancers': advancers,
+        'decliners': decliners,
+        'unchanged': unchanged,
+        'ew_change': ew_change,
+        'median_change': median_change,
+        'top_symbol': symbols[top_pos] if len(symbols) else None,
+        'top_contribution': top_contribution,
+        'bottom_symbol': symbols[bottom_pos] if len(symbols) else None,
+        'bottom_contribution': bottom_contribution,
+        'new_high_ratio': new_high_ratio,
+        'new_low_ratio': new_low_ratio,
+    }, index=membership.indices)
+    return frame[has_data]
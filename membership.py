@@ -0,0 +1,135 @@
+"""
+Endeks üyelikleri.
+
+Üyelikler data/constituents.json dosyasından okunur:
+    {
+      "version": "...",
+      "effective_date": "YYYY-MM-DD",      # "indices" anlık görüntüsünün geçerli olduğu gün
+      "indices": {"XU030.IS": ["AKBNK.IS", ...], ...},
+      "changes": [                          # tarihli üyelik değişiklikleri
+        {"date": "YYYY-MM-DD", "index": "XU030.IS", "add": [...], "remove": [...]}
+      ]
+    }
+
+Değişiklikler "date" gününden itibaren geçerlidir. Geçmiş bir gün için
+yüklemede, anlık görüntüden sonraki değişiklikler geri alınır; ileri bir gün
+için aradaki değişiklikler uygulanır.
+"""
+import json
+import os
+import sys
+from datetime import date, datetime
+
+import numpy as np
+
+MEMBERSHIP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'constituents.json')
+
+
+class Membership:
+    """
+    Endeks x hisse boolean üyelik matrisi.
+    Semboller tek bir tabloda intern edilir; satır/sütun konumları sözlüklerde
+    tutulduğu için "hissenin endeksleri" ve "endeksin üyeleri" O(1)'dir.
+    """
+
+    def __init__(self, constituents, version=None):
+        self.version = version
+        self.indices = [sys.intern(code) for code in constituents]
+        self.symbols = sorted({sys.intern(s) for members in constituents.values() for s in members})
+        self.index_pos = {code: i for i, code in enumerate(self.indices)}
+        self.symbol_pos = {sym: j for j, sym in enumerate(self.symbols)}
+
+        self.matrix = np.zeros((len(self.indices), len(self.symbols)), dtype=bool)
+        self._members = {}
+        for i, code in enumerate(self.indices):
+            members = list(dict.fromkeys(constituents[code]))
+            self._members[code] = members
+            self.matrix[i, [self.symbol_pos[s] for s in members]] = True
+
+        self._parents = {
+            sym: [self.indices[i] for i in np.flatnonzero(self.matrix[:, j])]
+            for j, sym in enumerate(self.symbols)
+        }
+
+    def members(self, index_code):
+        return self._members.get(index_code, [])
+
+    def parents(self, symbol):
+        return self._parents.get(symbol, [])
+
+    def mean(self, values):
+        """
+        Sembol sırasıyla hizalı değerlerin (NaN = yok) her endeks için eşit
+        ağırlıklı ortalamasını tek bir matris çarpımıyla hesaplar.
+        """
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        mask = self.matrix & valid
+        counts = mask.sum(axis=1)
+        sums = mask.astype(float) @ np.where(valid, values, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _apply_change(constituents, change, reverse=False):
+    members = constituents.setdefault(change['index'], [])
+    add, remove = change.get('add', []), change.get('remove', [])
+    if reverse:
+        add, remove = remove, add
+    removed = set(remove)
+    members[:] = [s for s in members if s not in removed]
+    members.extend(s for s in add if s not in members)
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _as_date(day):
+    return day.date() if isinstance(day, datetime) else day
+
+
+def _constituents_at(data, as_of=None):
+    constituents = {code: list(members) for code, members in data['indices'].items()}
+    if as_of is not None:
+        as_of = _as_date(as_of)
+        base = date.fromisoformat(data.get('effective_date', '1970-01-01'))
+        changes = sorted(data.get('changes', []), key=lambda c: c['date'])
+        for change in changes:
+            day = date.fromisoformat(change['date'])
+            if base < day <= as_of:
+                _apply_change(constituents, change)
+        for change in reversed(changes):
+            day = date.fromisoformat(change['date'])
+            if as_of < day <= base:
+                _apply_change(constituents, change, reverse=True)
+    return constituents
+
+
+def load_membership(path=MEMBERSHIP_FILE, as_of=None):
+    """
+    Üyelik dosyasını okur ve as_of gününde geçerli üyeliklerle Membership döner.
+    as_of verilmezse dosyadaki anlık görüntü kullanılır.
+    """
+    data = _read(path)
+    return Membership(_constituents_at(data, as_of), version=data.get('version'))
+
+
+def load_membership_between(start, end, path=MEMBERSHIP_FILE):
+    """
+    [start, end] aralığının herhangi bir gününde endekste olan tüm hisselerle
+    Membership döner (geçmiş veri yüklemede aralık içinde çıkarılan hisseler de gelsin diye).
+    Başlangıçtaki üyeliklere aralıktaki her değişiklik gününün üyelikleri eklenir.
+    """
+    data = _read(path)
+    start, end = _as_date(start), _as_date(end)
+    days = {start} | {date.fromisoformat(c['date']) for c in data.get('changes', [])
+                      if start < date.fromisoformat(c['date']) <= end}
+
+    union = {}
+    for day in sorted(days):
+        for code, members in _constituents_at(data, day).items():
+            union.setdefault(code, [])
+            union[code].extend(s for s in members if s not in union[code])
+    return Membership(union, version=data.get('version'))
@@ -0,0 +1,147 @@
+"""
+Aşama bazlı ölçümler ve çalıştırma raporu.
+
+Her aşama (fiyat indirme, referans okuma, Yahoo fallback, hesaplama, yayınlama)
+için gecikme histogramı, çağrı ve hata sayıları tutulur; ayrıca serbest
+sayaçlar (yeniden deneme, fallback'e düşen sembol, düşen sembol vb.) vardır.
+Çalıştırma sonunda JSON rapor ve isteğe bağlı Prometheus metin dosyası yazılır.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# Gecikme histogramı kova sınırları (saniye)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = datetime.now()
+            self.start = time.perf_counter()
+            self.stages = {}
+            self.counters = Counter()
+            self.labels = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Bloğun süresini `name` aşamasına kaydeder; blok hata fırlatırsa
+        hata olarak da sayar (hata yutulmaz, yukarı iletilir).
+        """
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, error)
+
+    def observe(self, name, seconds, error=False):
+        with self.lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {
+                    'count': 0, 'errors': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * (len(BUCKETS) + 1),
+                }
+            stage['count'] += 1
+            stage['errors'] += int(error)
+            stage['sum'] += seconds
+            stage['max'] = max(stage['max'], seconds)
+            idx = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+            stage['buckets'][idx] += 1
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def record(self, name, items):
+        """
+        Rapora liste olarak girecek değerleri (ör. düşen semboller) ekler.
+        """
+        with self.lock:
+            self.labels.setdefault(name, []).extend(items)
+
+    def report(self, **extra):
+        with self.lock:
+            stages = {}
+            for name, stage in sorted(self.stages.items()):
+                stages[name] = {
+                    'count': stage['count'],
+                    'errors': stage['errors'],
+                    'total_seconds': round(stage['sum'], 4),
+                    'mean_seconds': round(stage['sum'] / stage['count'], 4) if stage['count'] else 0.0,
+                    'max_seconds': round(stage['max'], 4),
+                    'histogram': {('+Inf' if i == len(BUCKETS) else str(BUCKETS[i])): n
+                                  for i, n in enumerate(stage['buckets'])},
+                }
+            return {
+                'started_at': self.started_at.isoformat(),
+                'finished_at': datetime.now().isoformat(),
+                'wall_seconds': round(time.perf_counter() - self.start, 3),
+                'stages': stages,
+                'counters': {k: (round(v, 4) if isinstance(v, float) else v) for k, v in sorted(self.counters.items())},
+                **{name: sorted(values) for name, values in sorted(self.labels.items())},
+                **extra,
+            }
+
+    def prometheus(self, prefix='bist_fetcher'):
+        """
+        Ölçümleri Prometheus metin formatında döner (node_exporter textfile uyumlu).
+        """
+        report = self.report()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Aşama gecikmeleri",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self.lock:
+            stages = {name: dict(stage, buckets=list(stage['buckets'])) for name, stage in sorted(self.stages.items())}
+        for name, stage in stages.items():
+            cumulative = 0
+            for i, n in enumerate(stage['buckets']):
+                cumulative += n
+                le = '+Inf' if i == len(BUCKETS) else str(BUCKETS[i])
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stage["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+
+        lines += [f"# HELP {prefix}_stage_errors_total Aşama hataları",
+                  f"# TYPE {prefix}_stage_errors_total counter"]
+        lines += [f'{prefix}_stage_errors_total{{stage="{name}"}} {stage["errors"]}' for name, stage in stages.items()]
+
+        lines += [f"# HELP {prefix}_events_total Sayaçlar",
+                  f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{event="{name}"}} {value}' for name, value in report['counters'].items()]
+
+        lines += [f"# HELP {prefix}_run_duration_seconds Çalıştırma süresi",
+                  f"# TYPE {prefix}_run_duration_seconds gauge",
+                  f"{prefix}_run_duration_seconds {report['wall_seconds']}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path=None, prometheus_path=None, **extra):
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.report(**extra), indent=2, ensure_ascii=False))
+        if prometheus_path:
+            _write_atomic(prometheus_path, self.prometheus())
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+METRICS = Metrics()
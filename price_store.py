@@ -0,0 +1,147 @@
+"""
+Yerel fiyat geçmişi deposu.
+
+Kapanış fiyatları (tarih x sembol) matrisi olarak diskte tutulur:
+    <dizin>/closes.npy  -> float64 matris, eksik değerler NaN
+    <dizin>/meta.json   -> {"dates": [...], "symbols": [...],
+                            "seeded_from": "YYYY-MM-DD", "synced_through": "YYYY-MM-DD"}
+
+Depoya yerel olarak da satır eklenir (bugünün kapanışları, DB'den okunan
+referanslar); bu yüzden DB ile eşitlemenin nereye kadar yapıldığı son
+tarihten değil, yalnızca başarılı bir eşitlemenin ilerlettiği
+seeded_from/synced_through işaretlerinden okunur.
+
+Matris np.load(mmap_mode='r') ile açılır; böylece tam geçmiş okumaları ucuzdur
+ve referans fiyatlar ağ erişimi olmadan okunur. Dizin GitHub Actions
+cache'i ile çalıştırmalar arasında taşınabilir.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class PriceStore:
+    def __init__(self, path):
+        self.path = path
+        self.seeded_from = None
+        self.synced_through = None
+        self.frame = self._load()
+
+    @property
+    def _data_path(self):
+        return os.path.join(self.path, 'closes.npy')
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def _load(self):
+        if not (os.path.exists(self._data_path) and os.path.exists(self._meta_path)):
+            return pd.DataFrame(index=pd.DatetimeIndex([]), dtype=float)
+
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            values = np.load(self._data_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"Price store read error in {self.path}: {e}")
+            return pd.DataFrame(index=pd.DatetimeIndex([]), dtype=float)
+
+        self.seeded_from = _timestamp(meta.get('seeded_from'))
+        self.synced_through = _timestamp(meta.get('synced_through'))
+        return pd.DataFrame(values, index=pd.to_datetime(meta['dates']), columns=meta['symbols'], copy=False)
+
+    def last_date(self):
+        """
+        Depodaki en son tarihi döner; depo boşsa None.
+        """
+        if self.frame.empty:
+            return None
+        return self.frame.index[-1]
+
+    def mark_synced(self, seeded_from, synced_through):
+        """
+        Başarılı bir DB eşitlemesinden sonra çağrılır: DB geçmişinin hangi
+        günden itibaren ve hangi güne kadar depoya alındığını kaydeder.
+        """
+        self.seeded_from = _timestamp(seeded_from)
+        self.synced_through = _timestamp(synced_through)
+
+    def update(self, rows):
+        """
+        (symbol, date, close) satırlarını depoya ekler.
+        Aynı (symbol, date) için yeni gelen değer eskisinin yerine geçer.
+        """
+        new = pd.DataFrame(list(rows), columns=['symbol', 'date', 'close']).dropna(subset=['close'])
+        if new.empty:
+            return 0
+
+        new['date'] = pd.to_datetime(new['date'], format='ISO8601').dt.tz_localize(None).dt.normalize()
+        new['close'] = new['close'].astype(float)
+        new = new.drop_duplicates(['date', 'symbol'], keep='last') \
+            .pivot(index='date', columns='symbol', values='close')
+
+        index = self.frame.index.union(new.index)
+        columns = self.frame.columns.union(new.columns)
+        values = self.frame.reindex(index=index, columns=columns).to_numpy(dtype=float, copy=True)
+        patch = new.reindex(index=index, columns=columns).to_numpy(dtype=float)
+        found = ~np.isnan(patch)
+        values[found] = patch[found]
+        self.frame = pd.DataFrame(values, index=index, columns=columns)
+        return int(found.sum())
+
+    def get(self, symbol, day):
+        """
+        Verilen tarihteki kapanışı döner; yoksa None.
+        """
+        day = pd.Timestamp(day).normalize()
+        if symbol not in self.frame.columns or day not in self.frame.index:
+            return None
+        value = self.frame.at[day, symbol]
+        return None if pd.isna(value) else float(value)
+
+    def reference_prices(self, symbols, dates):
+        """
+        load_reference_prices ile aynı formatta sözlük döner:
+        (sembol, 'YYYY-MM-DD') -> close. Depoda olmayan değerler sözlüğe girmez.
+        """
+        prices = {}
+        for sym in symbols:
+            for day in dates:
+                close = self.get(sym, day)
+                if close is not None:
+                    prices[(sym, day.strftime('%Y-%m-%d'))] = close
+        return prices
+
+    def save(self):
+        """
+        Depoyu diske yazar. Yarım kalmış bir yazım eski dosyaları bozmasın diye
+        önce geçici dosyalara yazılıp sonra yer değiştirilir.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        meta = {
+            'dates': [d.strftime('%Y-%m-%d') for d in self.frame.index],
+            'symbols': [str(s) for s in self.frame.columns],
+            'seeded_from': _date_str(self.seeded_from),
+            'synced_through': _date_str(self.synced_through),
+        }
+        values = np.ascontiguousarray(self.frame.to_numpy(dtype=float))
+
+        tmp_data = self._data_path + '.tmp'
+        tmp_meta = self._meta_path + '.tmp'
+        with open(tmp_data, 'wb') as f:
+            np.save(f, values)
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_data, self._data_path)
+        os.replace(tmp_meta, self._meta_path)
+
+
+def _timestamp(value):
+    return None if value is None else pd.Timestamp(value).normalize()
+
+
+def _date_str(value):
+    return None if value is None else value.strftime('%Y-%m-%d')
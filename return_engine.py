@@ -0,0 +1,44 @@
+"""
+Çok ufuklu getiri motoru.
+
+Tarih x sembol kapanış matrisinden tüm semboller için 1G, 1H, 2H, 3H, 1A ve 3A
+yüzde değişimlerini tek bir vektörel geçişte hesaplar.
+"""
+import numpy as np
+import pandas as pd
+
+HORIZONS = ('1d', '1w', '2w', '3w', '1m', '3m')
+
+
+def compute_returns(closes, current, ref_dates):
+    """
+    closes:    tarih x sembol kapanış matrisi (DataFrame, NaN = veri yok)
+    current:   sembol -> güncel fiyat (Series)
+    ref_dates: ufuk -> referans tarihi (dict, ör. {'1d': ..., '1w': ...})
+
+    Her ufuk için referans, referans tarihinde ya da öncesindeki son mevcut
+    kapanıştır; eksik gün 0 sayılmaz. Referansı olmayan ya da referansı 0 olan
+    sembollerin değişimi NaN olur.
+    Dönen tablo: index=sembol, kolonlar=ufuklar, 2 haneye yuvarlanmış yüzde değişim.
+    """
+    horizons = list(ref_dates)
+    symbols = current.index
+
+    closes = closes.sort_index().reindex(columns=symbols)
+    filled = closes.ffill().to_numpy(dtype=float)
+
+    targets = pd.DatetimeIndex([pd.Timestamp(ref_dates[h]).normalize() for h in horizons])
+    # Her referans tarihinde ya da öncesindeki son satırın konumu (-1: hiç yok)
+    positions = closes.index.searchsorted(targets, side='right') - 1
+
+    refs = np.full((len(horizons), len(symbols)), np.nan)
+    found = positions >= 0
+    if filled.size:
+        refs[found] = filled[positions[found]]
+
+    cur = current.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = (cur[np.newaxis, :] - refs) / refs * 100
+    changes[~np.isfinite(changes)] = np.nan
+
+    return pd.DataFrame(changes.T, index=symbols, columns=horizons).round(2)
@@ -0,0 +1,106 @@
+"""
+Çalıştırma günlüğü (run journal).
+
+Günlük güncellemede her sembolün sonucu, hesaplanır hesaplanmaz yerel bir
+dosyaya JSON satırı olarak eklenir:
+    {"run_date": "YYYY-MM-DD", "table": "...", "symbol": "...", "stats": {...}}
+
+Çalıştırma yarıda kesilirse aynı seans günü için yeniden başlatılan çalıştırma
+günlükteki sembolleri atlar; yalnızca kalan işler için ağa çıkılır. Başka bir
+güne ait kayıtlar yok sayılır ve ilk yazımda dosya sıfırlanır. Yarım yazılmış
+son satır (çökme anında) okunurken atlanır.
+"""
+import json
+import os
+import threading
+
+
+class RunJournal:
+    def __init__(self, path, run_date):
+        self.path = path
+        self.run_date = run_date
+        self.lock = threading.Lock()
+        self._file = None
+        self._stale = False
+        self.entries = self._load()
+
+    def _load(self):
+        entries = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return entries
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('run_date') != self.run_date:
+                self._stale = True
+                continue
+            entries[(record['table'], record['symbol'])] = record['stats']
+        return entries
+
+    def get(self, table_name, symbol):
+        """
+        Sembol bu gün için daha önce tamamlandıysa kaydedilen sonucu, değilse None döner.
+        """
+        return self.entries.get((table_name, symbol))
+
+    def _open(self):
+        if self._stale:
+            self._stale = False
+            return open(self.path, 'w', encoding='utf-8')
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Önceki çalıştırma satırın ortasında öldüyse yeni kayıt ayrı satırda başlasın
+        partial = False
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    partial = f.read(1) != b'\n'
+        except OSError:
+            pass
+
+        f = open(self.path, 'a', encoding='utf-8')
+        if partial:
+            f.write('\n')
+        return f
+
+    def append(self, table_name, symbol, stats):
+        """
+        Sonucu günlüğe ekler ve diske işler (flush + fsync).
+        """
+        line = json.dumps({'run_date': self.run_date, 'table': table_name, 'symbol': symbol, 'stats': stats},
+                          ensure_ascii=False)
+        with self.lock:
+            if self._file is None:
+                self._file = self._open()
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries[(table_name, symbol)] = stats
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+        """
+        Çalıştırma tamamen yayınlandıktan sonra günlüğü boşaltır; böylece aynı gün
+        yapılan bir sonraki çalıştırma fiyatları baştan çeker. Dosya silinmez,
+        boş bırakılır (CI cache'inde eski bir günlüğün geri gelmemesi için).
+        """
+        self.close()
+        with self.lock:
+            self.entries = {}
+            self._stale = False
+            if os.path.exists(self.path):
+                open(self.path, 'w').close()
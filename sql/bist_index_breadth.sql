@@ -0,0 +1,18 @@
+-- Endeks genişlik/katkı analizi (data_fetcher.run_update, bkz. index_analytics.py)
+-- Günlük çalıştırma satırları `code` üzerinden upsert eder; bu yüzden `code` benzersiz olmalı.
+create table if not exists public.bist_index_breadth (
+    code                text primary key,          -- endeks kodu, ör. XU030
+    members             integer not null,          -- getirisi hesaplanabilen üye sayısı
+    advancers           integer not null,
+    decliners           integer not null,
+    unchanged           integer not null,
+    ew_change1d         double precision,          -- eşit ağırlıklı günlük değişim (%)
+    median_change1d     double precision,          -- üyelerin medyan günlük değişimi (%)
+    top_symbol          text,
+    top_contribution    double precision,          -- en çok katkı yapan üyenin katkısı (puan)
+    bottom_symbol       text,
+    bottom_contribution double precision,
+    new_high_ratio      double precision,          -- 1 aylık zirvesini aşan üye oranı (0-1)
+    new_low_ratio       double precision,          -- 1 aylık dibinin altına inen üye oranı (0-1)
+    updated_at          timestamptz
+);
@@ -0,0 +1,76 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import data_fetcher
+import membership
+from fake_backends import FakeSupabase, SyntheticQuotes
+
+START = datetime(2026, 9, 1)
+END = datetime(2026, 9, 30)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_fetcher, 'PRICE_STORE_DIR', str(tmp_path / 'price_store'))
+    return {
+        'db': FakeSupabase(),
+        'quotes': SyntheticQuotes(today=END),
+        'checkpoint': str(tmp_path / 'checkpoint.json'),
+    }
+
+
+def _backfill(env, end, downloader=None, **kwargs):
+    return data_fetcher.backfill(START, end, chunk_size=100, checkpoint_path=env['checkpoint'],
+                                 downloader=downloader or env['quotes'].download, client=env['db'], **kwargs)
+
+
+def test_default_fields_match_history_schema(env):
+    assert _backfill(env, END) == 0
+    row = next(iter(env['db'].tables['bist_price_history'].values()))
+    assert set(row) == {'symbol', 'date', 'close'}
+
+
+def test_resume_without_end_reuses_checkpoint_range(env):
+    calls = []
+
+    def flaky(chunk, **kwargs):
+        calls.append(kwargs['end'])
+        if len(calls) == 3:
+            raise ConnectionError("throttled")
+        return env['quotes'].download(chunk, **kwargs)
+
+    assert _backfill(env, None, downloader=flaky) == 1
+    with open(env['checkpoint']) as f:
+        checkpoint = json.load(f)
+    assert not checkpoint['complete']
+    first_end = checkpoint['end']
+
+    # Aynı başlangıçla, bitiş tarihi verilmeden (ör. ertesi gün) yeniden çalıştırma
+    calls.clear()
+    assert _backfill(env, None, downloader=flaky) == 0
+    assert len(calls) == 1
+    with open(env['checkpoint']) as f:
+        checkpoint = json.load(f)
+    assert checkpoint['end'] == first_end
+    assert checkpoint['complete']
+
+
+def test_completed_checkpoint_is_not_reused(env):
+    assert _backfill(env, END) == 0
+    assert data_fetcher._checkpoint_end(env['checkpoint'], START) is None
+
+
+def test_backfills_members_removed_inside_the_range(env, monkeypatch):
+    fixture = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'membership_changes.json')
+    monkeypatch.setattr(data_fetcher, 'load_membership_between',
+                        lambda start, end: membership.load_membership_between(start, end, path=fixture))
+    monkeypatch.setattr(data_fetcher, 'INDICES', {})
+
+    assert data_fetcher.backfill(datetime(2026, 5, 15), datetime(2026, 9, 15), checkpoint_path=env['checkpoint'],
+                                 downloader=SyntheticQuotes(today=datetime(2026, 9, 15)).download,
+                                 client=env['db']) == 0
+    written = {row['symbol'] for row in env['db'].tables['bist_price_history'].values()}
+    assert written == {'AKBNK', 'ASELS', 'GARAN', 'HALKB', 'THYAO', 'YKBNK'}
@@ -0,0 +1,86 @@
+import json
+
+import data_fetcher
+from fake_backends import FakeSupabase, SyntheticQuotes
+
+
+class FailingWrites(FakeSupabase):
+    def __init__(self, table_name='bist_indices', **kwargs):
+        super().__init__(**kwargs)
+        self.failing_table = table_name
+
+    def _execute(self, query):
+        if query.operation == 'upsert' and query.table_name == self.failing_table:
+            raise ConnectionError("write rejected")
+        return super()._execute(query)
+
+
+def _main(tmp_path, monkeypatch, client, *argv, quotes=None):
+    monkeypatch.setattr(data_fetcher, 'PRICE_STORE_DIR', str(tmp_path / 'price_store'))
+    monkeypatch.setitem(data_fetcher._backends, 'client', client)
+    monkeypatch.setitem(data_fetcher._backends, 'quotes', quotes or SyntheticQuotes())
+    return data_fetcher.main(['--rate', '0', '--retries', '0', '--journal', '', '--report',
+                              str(tmp_path / 'report.json'), *argv])
+
+
+def test_update_exit_code_reflects_failed_batches(tmp_path, monkeypatch):
+    # Yazma yeniden denemeleri arasında beklenmesin
+    monkeypatch.setattr(data_fetcher.time, 'sleep', lambda seconds: None)
+    assert _main(tmp_path, monkeypatch, FakeSupabase(), 'indices') == 0
+    assert _main(tmp_path, monkeypatch, FailingWrites(), 'indices') == 1
+
+
+def _report(tmp_path):
+    with open(tmp_path / 'report.json') as f:
+        return json.load(f)
+
+
+def test_update_fails_when_nothing_is_published(tmp_path, monkeypatch):
+    # Yahoo hiçbir sembol için fiyat vermiyor (ör. tam engel); yazılamayan batch yok
+    assert _main(tmp_path, monkeypatch, FakeSupabase(), '--max-dropped', '1', 'indices',
+                 quotes=SyntheticQuotes(missing_rate=1.0)) == 1
+    report = _report(tmp_path)
+    assert report['status'] == 'failed'
+    assert report['counters']['symbols_published'] == 0
+
+
+def test_update_fails_above_the_dropped_share_and_keeps_the_journal(tmp_path, monkeypatch):
+    journal = tmp_path / 'journal.jsonl'
+    quotes = SyntheticQuotes(missing_rate=0.3)
+    assert _main(tmp_path, monkeypatch, FakeSupabase(), '--journal', str(journal), quotes=quotes) == 1
+    assert _report(tmp_path)['dropped_share'] > 0.1
+    # Yayınlanan semboller günlükte kalır; yeniden çalıştırma yalnızca düşenleri çeker
+    assert journal.read_text().count('\n') == _report(tmp_path)['counters']['symbols_published']
+
+    assert _main(tmp_path, monkeypatch, FakeSupabase(), '--max-dropped', '0.9', 'indices', quotes=quotes) == 0
+    assert _report(tmp_path)['status'] == 'ok'
+
+
+def test_missing_breadth_table_does_not_fail_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_fetcher.time, 'sleep', lambda seconds: None)
+    assert _main(tmp_path, monkeypatch, FailingWrites('bist_index_breadth'), 'stocks', '--index', 'XU030') == 0
+
+    report = _report(tmp_path)
+    assert report['status'] == 'ok'
+    assert report['counters']['breadth_failed_batches'] == 1
+
+
+def test_missing_credentials_exit_code(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_fetcher, '_load_credentials', lambda: (None, None))
+    monkeypatch.setitem(data_fetcher._backends, 'client', None)
+    assert data_fetcher.main(['--report', '', 'indices']) == 2
+
+
+def test_selection_before_and_after_the_command_is_merged():
+    args = data_fetcher.parse_args(['--index', 'XBANK', 'stocks', '--index', 'XU030', '--symbols', 'THYAO'])
+    assert args.command == 'stocks'
+    assert args.index_codes == ['XBANK', 'XU030']
+    assert args.symbols == ['THYAO']
+
+    args = data_fetcher.parse_args(['--symbols', 'GARAN,AKBNK', 'update', '--symbols', 'THYAO'])
+    assert args.index_codes is None
+    assert args.symbols == ['GARAN', 'AKBNK', 'THYAO']
+
+    args = data_fetcher.parse_args(['--index', 'XBANK'])
+    assert args.command is None
+    assert args.index_codes == ['XBANK']
@@ -0,0 +1,58 @@
+import pandas as pd
+
+import data_fetcher
+from fake_backends import SyntheticQuotes
+
+
+def _symbols(n):
+    return [f"S{i:04d}.IS" for i in range(n)]
+
+
+def test_calls_grow_with_chunks_not_symbols():
+    quotes = SyntheticQuotes()
+    result = data_fetcher.fetch_quotes(_symbols(250), chunk_size=100, downloader=quotes.download)
+    assert quotes.calls['download'] == 3
+    assert len(result) == 250
+    assert list(result.columns) == ['Close', 'Volume']
+
+
+def test_small_universe_is_a_single_call():
+    quotes = SyntheticQuotes()
+    result = data_fetcher.fetch_quotes(_symbols(2), chunk_size=100, downloader=quotes.download)
+    assert quotes.calls['download'] == 1
+    assert sorted(result.index) == _symbols(2)
+
+
+def test_duplicates_do_not_add_calls():
+    quotes = SyntheticQuotes()
+    data_fetcher.fetch_quotes(_symbols(100) * 2, chunk_size=100, downloader=quotes.download)
+    assert quotes.calls['download'] == 1
+
+
+def test_failed_chunk_is_skipped():
+    quotes = SyntheticQuotes()
+    calls = []
+
+    def downloader(chunk, **kwargs):
+        calls.append(chunk)
+        if len(calls) == 2:
+            raise ConnectionError("boom")
+        return quotes.download(chunk, **kwargs)
+
+    result = data_fetcher.fetch_quotes(_symbols(250), chunk_size=100, downloader=downloader)
+    assert len(calls) == 3
+    assert len(result) == 150
+
+
+def test_last_quotes_single_ticker_flat_columns():
+    dates = pd.bdate_range('2026-10-12', periods=3)
+    data = pd.DataFrame({
+        'Open': [9.0, 10.0, 11.0], 'High': [9.5, 10.5, 11.5], 'Low': [8.5, 9.5, 10.5],
+        'Close': [9.2, 10.2, float('nan')], 'Volume': [100.0, 200.0, 300.0],
+    }, index=dates)
+
+    result = data_fetcher._last_quotes(data, ['THYAO.IS'])
+    assert list(result.index) == ['THYAO.IS']
+    # Son geçerli kapanış ve o günün hacmi alınır
+    assert result.at['THYAO.IS', 'Close'] == 10.2
+    assert result.at['THYAO.IS', 'Volume'] == 200.0
@@ -0,0 +1,68 @@
+import os
+from datetime import date, datetime
+
+import pytest
+
+from membership import load_membership, load_membership_between
+
+# Anlık görüntü 2026-06-01 tarihli; değişiklikler bundan önce, aynı gün ve sonra
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'membership_changes.json')
+
+
+def test_snapshot_without_as_of():
+    membership = load_membership(FIXTURE)
+
+    assert membership.version == 'test'
+    assert membership.members('XU030.IS') == ['AKBNK.IS', 'GARAN.IS', 'THYAO.IS']
+    assert membership.members('XBANK.IS') == ['AKBNK.IS', 'GARAN.IS', 'YKBNK.IS']
+    assert membership.parents('AKBNK.IS') == ['XU030.IS', 'XBANK.IS']
+
+
+@pytest.mark.parametrize('as_of', [date(2026, 6, 1), datetime(2026, 6, 1, 19, 0), date(2026, 8, 31)])
+def test_snapshot_day_and_days_before_next_change(as_of):
+    membership = load_membership(FIXTURE, as_of=as_of)
+
+    assert membership.members('XU030.IS') == ['AKBNK.IS', 'GARAN.IS', 'THYAO.IS']
+    assert membership.members('XBANK.IS') == ['AKBNK.IS', 'GARAN.IS', 'YKBNK.IS']
+    assert membership.parents('THYAO.IS') == ['XU030.IS']
+
+
+def test_before_snapshot_reverts_later_changes():
+    # 2026-06-01 değişikliği geri alınır; 2026-03-01 değişikliği hâlâ geçerli
+    membership = load_membership(FIXTURE, as_of=date(2026, 5, 31))
+    assert membership.members('XBANK.IS') == ['AKBNK.IS', 'GARAN.IS', 'HALKB.IS']
+    assert membership.members('XU030.IS') == ['AKBNK.IS', 'GARAN.IS', 'THYAO.IS']
+    assert membership.parents('YKBNK.IS') == []
+    assert membership.parents('HALKB.IS') == ['XBANK.IS']
+
+    # 2026-03-01 değişikliği de geri alınır
+    membership = load_membership(FIXTURE, as_of=date(2026, 2, 28))
+    assert membership.members('XU030.IS') == ['AKBNK.IS', 'GARAN.IS', 'SISE.IS']
+    assert membership.parents('THYAO.IS') == []
+    assert membership.parents('SISE.IS') == ['XU030.IS']
+    assert 'THYAO.IS' not in membership.symbols
+
+
+def test_after_snapshot_applies_changes_from_their_date():
+    membership = load_membership(FIXTURE, as_of=date(2026, 9, 1))
+
+    assert membership.members('XU030.IS') == ['AKBNK.IS', 'GARAN.IS', 'ASELS.IS']
+    assert membership.members('XBANK.IS') == ['AKBNK.IS', 'GARAN.IS', 'YKBNK.IS']
+    assert membership.parents('ASELS.IS') == ['XU030.IS']
+    assert membership.parents('THYAO.IS') == []
+    assert membership.symbols == ['AKBNK.IS', 'ASELS.IS', 'GARAN.IS', 'YKBNK.IS']
+
+
+def test_between_keeps_members_removed_inside_the_range():
+    membership = load_membership_between(date(2026, 5, 15), datetime(2026, 9, 15), path=FIXTURE)
+
+    # HALKB 2026-06-01'de, THYAO 2026-09-01'de çıkarıldı; aralıkta endekste oldukları günler var
+    assert membership.members('XU030.IS') == ['AKBNK.IS', 'GARAN.IS', 'THYAO.IS', 'ASELS.IS']
+    assert membership.members('XBANK.IS') == ['AKBNK.IS', 'GARAN.IS', 'HALKB.IS', 'YKBNK.IS']
+    # SISE aralık başlamadan çıkarılmıştı
+    assert membership.symbols == ['AKBNK.IS', 'ASELS.IS', 'GARAN.IS', 'HALKB.IS', 'THYAO.IS', 'YKBNK.IS']
+
+
+def test_between_a_single_day_matches_as_of():
+    day = date(2026, 9, 1)
+    assert load_membership_between(day, day, path=FIXTURE).symbols == load_membership(FIXTURE, as_of=day).symbols
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import data_fetcher
+from fake_backends import FakeSupabase, SyntheticQuotes, seed_history
+from price_store import PriceStore
+
+TABLE = 'bist_index_history'
+SYMBOLS = ['XU030.IS', 'XU100.IS']
+
+
+def _db(quotes, sessions=120):
+    db = FakeSupabase()
+    seed_history(db, quotes, TABLE, SYMBOLS, sessions)
+    return db
+
+
+def test_failed_first_sync_is_retried_as_a_seed(tmp_path):
+    quotes = SyntheticQuotes()
+    db = _db(quotes)
+
+    # İlk eşitleme başarısız; run_update yine de bugünün kapanışlarını depoya yazıp kaydeder
+    store = PriceStore(str(tmp_path))
+    assert data_fetcher.sync_price_store(store, TABLE, client=FakeSupabase(failure_rate=1.0)) == 0
+    assert store.synced_through is None
+    store.update([('XU030', quotes.today, 1.0), ('XU100', quotes.today, 2.0)])
+    store.save()
+
+    store = PriceStore(str(tmp_path))
+    synced = data_fetcher.sync_price_store(store, TABLE, client=db, history_days=400)
+    assert synced == 120 * len(SYMBOLS)
+    assert store.frame.index[0] == pd.bdate_range(end=quotes.today - timedelta(days=1), periods=120)[0]
+    assert store.synced_through == quotes.today - pd.offsets.BDay(1)
+
+
+def test_synced_store_only_pulls_from_watermark(tmp_path):
+    quotes = SyntheticQuotes()
+    db = _db(quotes)
+
+    store = PriceStore(str(tmp_path))
+    data_fetcher.sync_price_store(store, TABLE, client=db, history_days=400)
+    store.update([('XU030', quotes.today, 1.0)])
+    store.save()
+
+    store = PriceStore(str(tmp_path))
+    assert store.synced_through == quotes.today - pd.offsets.BDay(1)
+    # Yalnızca son eşitlenen gün yeniden çekilir; yereldeki bugünün kapanışı işareti ilerletmez
+    assert data_fetcher.sync_price_store(store, TABLE, client=db, history_days=400) == len(SYMBOLS)
+
+
+def test_longer_history_window_reseeds(tmp_path):
+    quotes = SyntheticQuotes()
+    db = _db(quotes, sessions=200)
+
+    store = PriceStore(str(tmp_path))
+    short = data_fetcher.sync_price_store(store, TABLE, client=db, history_days=30)
+    assert data_fetcher.sync_price_store(store, TABLE, client=db, history_days=30) == len(SYMBOLS)
+
+    seeded = data_fetcher.sync_price_store(store, TABLE, client=db, history_days=400)
+    assert seeded == 200 * len(SYMBOLS) > short
+    assert store.seeded_from <= pd.Timestamp(datetime.now() - timedelta(days=400))
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+import data_fetcher
+from fake_backends import FakeSupabase
+
+DATES = [datetime(2026, 10, 15), datetime(2026, 10, 9)]
+
+
+class RecordingSupabase(FakeSupabase):
+    """
+    Her select sorgusundaki `in_('symbol', ...)` boyutunu kaydeder;
+    fail_on verilirse o sıradaki sorgu hata verir.
+    """
+
+    def __init__(self, fail_on=None, **kwargs):
+        super().__init__(**kwargs)
+        self.symbol_chunks = []
+        self.fail_on = fail_on
+
+    def _execute(self, query):
+        if query.operation == 'select':
+            symbols = [value for op, column, value in query.filters if op == 'in' and column == 'symbol']
+            self.symbol_chunks.append(len(symbols[0]))
+            if len(self.symbol_chunks) == self.fail_on:
+                raise ConnectionError("synthetic failure")
+        return super()._execute(query)
+
+
+def _seed(db, symbols):
+    db.seed('bist_price_history', [
+        {'symbol': sym, 'date': day.strftime('%Y-%m-%d'), 'close': float(i + 1)}
+        for i, sym in enumerate(symbols) for day in DATES
+    ])
+
+
+def _symbols(n):
+    return [f"S{i:04d}" for i in range(n)]
+
+
+def test_queries_grow_with_chunks(monkeypatch):
+    monkeypatch.setattr(data_fetcher, 'REFERENCE_CHUNK_SIZE', 200)
+    db = RecordingSupabase()
+    _seed(db, _symbols(450))
+
+    prices = data_fetcher.load_reference_prices(_symbols(450), DATES, 'bist_price_history', client=db)
+    assert db.calls['bist_price_history.select'] == 3
+    assert db.symbol_chunks == [200, 200, 50]
+    assert len(prices) == 900
+
+
+@pytest.mark.parametrize('dates', [DATES, DATES + [datetime(2026, 10, 2)]])
+def test_chunks_respect_row_cap(monkeypatch, dates):
+    # Chunk boyutu büyük olsa bile bir sorgu SUPABASE_MAX_ROWS satırı aşmamalı
+    monkeypatch.setattr(data_fetcher, 'REFERENCE_CHUNK_SIZE', 10_000)
+    db = RecordingSupabase()
+    _seed(db, _symbols(1200))
+
+    prices = data_fetcher.load_reference_prices(_symbols(1200), dates, 'bist_price_history', client=db)
+    cap = data_fetcher.SUPABASE_MAX_ROWS // len(dates)
+    assert max(db.symbol_chunks) == cap
+    assert all(size * len(dates) <= data_fetcher.SUPABASE_MAX_ROWS for size in db.symbol_chunks)
+    assert len(prices) == 1200 * 2
+
+
+def test_suffixed_and_clean_symbols_share_keys():
+    db = RecordingSupabase()
+    _seed(db, ['THYAO', 'GARAN'])
+
+    prices = data_fetcher.load_reference_prices(['THYAO.IS', 'GARAN', 'THYAO'], DATES,
+                                                'bist_price_history', client=db)
+    assert set(prices) == {(sym, day.strftime('%Y-%m-%d')) for sym in ('THYAO', 'GARAN') for day in DATES}
+    # 'THYAO.IS' ve 'THYAO' aynı sembol: tek sorguda, bir kez istenir
+    assert db.symbol_chunks == [2]
+
+
+def test_failed_chunk_does_not_drop_others(monkeypatch):
+    monkeypatch.setattr(data_fetcher, 'REFERENCE_CHUNK_SIZE', 100)
+    db = RecordingSupabase(fail_on=2)
+    _seed(db, _symbols(300))
+
+    prices = data_fetcher.load_reference_prices(_symbols(300), DATES, 'bist_price_history', client=db)
+    assert len(db.symbol_chunks) == 3
+    assert {sym for sym, _ in prices} == set(_symbols(100)) | set(_symbols(300)[200:])
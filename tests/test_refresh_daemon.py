@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import data_fetcher
+from fake_backends import FakeSupabase
+
+
+class FakeClock:
+    """
+    Beklemeleri gerçekten beklemeden saati ileri alan saat.
+    stop_at'e ulaşıldığında (ya da stop() çağrıldıysa) daemon'a durmasını söyler.
+    """
+
+    def __init__(self, start, stop_at):
+        self.time = start
+        self.stop_at = stop_at
+        self.waits = []
+
+    def now(self):
+        return self.time
+
+    def wait(self, seconds, stop_event):
+        self.waits.append(seconds)
+        self.time += timedelta(seconds=seconds)
+        return stop_event.is_set() or self.time >= self.stop_at
+
+
+class FakeQuotes:
+    """
+    Her sembole sabit bir fiyat veren indirici; bumped içindeki semboller
+    her turda değişir. Tur zamanlarını kaydeder (bir tur birden çok parça indirir).
+    """
+
+    def __init__(self, clock, bumped=()):
+        self.clock = clock
+        self.bumped = set(bumped)
+        self.calls = []
+
+    def __call__(self, tickers, **kwargs):
+        if not self.calls or self.calls[-1] != self.clock.now():
+            self.calls.append(self.clock.now())
+        prices = [100.0 + len(self.calls) if sym in self.bumped else 100.0 for sym in tickers]
+        columns = pd.MultiIndex.from_product([['Close', 'Volume'], tickers])
+        return pd.DataFrame([prices + [1_000_000.0] * len(tickers)], columns=columns,
+                            index=[pd.Timestamp(self.clock.now().date())])
+
+
+class RecordingSupabase(FakeSupabase):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.published = []
+
+    def _execute(self, query):
+        if query.operation == 'upsert':
+            self.published.append([row.get('code') or row.get('symbol') for row in query.rows])
+        return super()._execute(query)
+
+
+@pytest.fixture(autouse=True)
+def _isolate(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_fetcher, 'PRICE_STORE_DIR', str(tmp_path))
+    # Testler pytest'in SIGINT/SIGTERM işleyicilerini değiştirmesin
+    monkeypatch.setattr(data_fetcher.signal, 'signal', lambda *args: None)
+
+
+def _daemon(clock, quotes, db, interval=30):
+    return data_fetcher.RefreshDaemon(interval_minutes=interval, clock=clock, downloader=quotes, client=db)
+
+
+def test_closed_market_sleeps_until_next_open():
+    # Cumartesi öğlen: Pazartesi 10:00'a kadar uyur, hiç fiyat çekmez
+    clock = FakeClock(datetime(2026, 10, 17, 12, 0), stop_at=datetime(2026, 10, 19, 10, 0))
+    quotes = FakeQuotes(clock)
+    _daemon(clock, quotes, RecordingSupabase()).run()
+
+    assert clock.waits == [(datetime(2026, 10, 19, 10, 0) - datetime(2026, 10, 17, 12, 0)).total_seconds()]
+    assert quotes.calls == []
+
+
+def test_only_changed_symbols_are_republished():
+    now = datetime(2026, 10, 19, 11, 0)
+    clock = FakeClock(now, stop_at=now)
+    quotes = FakeQuotes(clock, bumped={'XU100.IS', 'THYAO.IS'})
+    db = RecordingSupabase()
+    daemon = _daemon(clock, quotes, db)
+    daemon.load(now)
+
+    total = len(data_fetcher.INDICES) + len(daemon.membership.symbols)
+    assert daemon.refresh(now) == total
+
+    db.published.clear()
+    clock.time += timedelta(minutes=30)
+    assert daemon.refresh(clock.now()) == 2
+    assert sorted(sym for batch in db.published for sym in batch) == ['THYAO', 'XU100']
+
+
+def test_final_round_lands_on_close_and_next_session_reloads(monkeypatch):
+    loads = []
+    original_load = data_fetcher.RefreshDaemon.load
+    monkeypatch.setattr(data_fetcher.RefreshDaemon, 'load',
+                        lambda self, now: (loads.append(now.date()), original_load(self, now)))
+
+    clock = FakeClock(datetime(2026, 10, 19, 17, 50), stop_at=datetime(2026, 10, 20, 10, 1))
+    quotes = FakeQuotes(clock, bumped={'XU030.IS'})
+    _daemon(clock, quotes, RecordingSupabase(), interval=30).run()
+
+    # 17:50 turundan sonra 30 dk değil kapanışa (18:10) kadar beklenir; kapanış turu da yapılır
+    assert quotes.calls[:2] == [datetime(2026, 10, 19, 17, 50), datetime(2026, 10, 19, 18, 10)]
+    assert clock.waits[:2] == [20 * 60, 1.0]
+    # Kapanıştan sonra bir sonraki açılışa kadar uyur, yeni seansta üyelik ve depolar yeniden yüklenir
+    assert quotes.calls[2:] == [datetime(2026, 10, 20, 10, 0)]
+    assert loads == [datetime(2026, 10, 19).date(), datetime(2026, 10, 20).date()]
+
+
+def test_stop_ends_the_loop():
+    clock = FakeClock(datetime(2026, 10, 19, 11, 0), stop_at=datetime(2026, 12, 31))
+    quotes = FakeQuotes(clock)
+    daemon = _daemon(clock, quotes, RecordingSupabase(), interval=5)
+
+    def stop_on_second_call(tickers, **kwargs):
+        if len(quotes.calls) == 1 and clock.now() != quotes.calls[0]:
+            daemon.stop()
+        return quotes(tickers, **kwargs)
+
+    daemon.downloader = stop_on_second_call
+    daemon.run()
+
+    # stop() ikinci turda çağrıldı: döngü sonraki beklemeden dönünce biter
+    assert quotes.calls == [datetime(2026, 10, 19, 11, 0), datetime(2026, 10, 19, 11, 5)]
+    assert clock.waits == [300, 300]
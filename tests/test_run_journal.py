@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+import data_fetcher
+from fake_backends import FakeSupabase, SyntheticQuotes
+from run_journal import RunJournal
+
+DAY = '2026-10-19'
+
+
+def _lines(path):
+    return path.read_text(encoding='utf-8').splitlines()
+
+
+def test_entries_survive_reopen(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = RunJournal(str(path), DAY)
+    journal.append('bist_price_history', 'THYAO.IS', {'price': 300.0})
+    journal.close()
+
+    assert RunJournal(str(path), DAY).get('bist_price_history', 'THYAO.IS') == {'price': 300.0}
+    assert RunJournal(str(path), DAY).get('bist_index_history', 'THYAO.IS') is None
+
+
+def test_other_days_are_ignored_and_truncated_on_first_write(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    path.write_text(json.dumps({'run_date': '2026-10-16', 'table': 'bist_price_history',
+                                'symbol': 'THYAO.IS', 'stats': {'price': 1.0}}) + '\n', encoding='utf-8')
+
+    journal = RunJournal(str(path), DAY)
+    assert journal.get('bist_price_history', 'THYAO.IS') is None
+    journal.append('bist_price_history', 'GARAN.IS', {'price': 2.0})
+    journal.close()
+
+    assert [json.loads(line)['symbol'] for line in _lines(path)] == ['GARAN.IS']
+
+
+def test_partial_last_line_is_skipped_and_not_merged(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    complete = json.dumps({'run_date': DAY, 'table': 'bist_price_history', 'symbol': 'THYAO.IS', 'stats': {'price': 1.0}})
+    # Önceki çalıştırma satırın ortasında öldü
+    path.write_text(complete + '\n' + complete[:30], encoding='utf-8')
+
+    journal = RunJournal(str(path), DAY)
+    assert journal.entries == {('bist_price_history', 'THYAO.IS'): {'price': 1.0}}
+    journal.append('bist_price_history', 'GARAN.IS', {'price': 2.0})
+    journal.close()
+
+    reopened = RunJournal(str(path), DAY)
+    assert reopened.get('bist_price_history', 'GARAN.IS') == {'price': 2.0}
+    assert len(reopened.entries) == 2
+
+
+def test_clear_truncates_instead_of_deleting(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = RunJournal(str(path), DAY)
+    journal.append('bist_price_history', 'THYAO.IS', {'price': 1.0})
+    journal.clear()
+
+    assert path.exists() and path.read_text() == ''
+    assert journal.get('bist_price_history', 'THYAO.IS') is None
+
+
+def test_retry_failed_refetches_only_missing_jobs_with_backoff():
+    jobs = ['A', 'B', 'C']
+    stats = [{'price': 1.0}, None, None]
+    refetched, waits = [], []
+    attempts = {'B': 0, 'C': 0}
+
+    def process(job):
+        attempts[job] += 1
+        # B ilk yeniden denemede, C ikincisinde kurtulur
+        return {'price': 2.0} if attempts[job] >= {'B': 1, 'C': 2}[job] else None
+
+    recovered = data_fetcher.retry_failed(jobs, stats, process, refetch=refetched.append,
+                                          attempts=3, delay=1.0, workers=1, sleep=waits.append)
+
+    assert recovered == 2
+    assert all(stats)
+    assert refetched == [['B', 'C'], ['C']]
+    assert waits == [1.0, 2.0]
+
+
+class CountingQuotes(SyntheticQuotes):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.downloaded = []
+
+    def download(self, tickers, **kwargs):
+        self.downloaded.extend(tickers)
+        return super().download(tickers, **kwargs)
+
+
+def test_interrupted_update_resumes_from_the_journal(tmp_path, monkeypatch):
+    journal_path = tmp_path / 'journal.jsonl'
+    db = FakeSupabase()
+    monkeypatch.setattr(data_fetcher, 'PRICE_STORE_DIR', str(tmp_path / 'price_store'))
+    monkeypatch.setitem(data_fetcher._backends, 'client', db)
+    argv = ['--workers', '1', '--rate', '0', '--retries', '0', '--journal', str(journal_path),
+            '--report', str(tmp_path / 'report.json')]
+
+    # 1. çalıştırma: 50 sembolden sonra kesilir (tüm endeksler ve ilk birkaç hisse)
+    done = 50
+    fetch_and_calculate = data_fetcher.fetch_and_calculate
+    calls = []
+
+    def interrupt_after(*args, **kwargs):
+        if len(calls) == done:
+            raise KeyboardInterrupt
+        calls.append(args[0])
+        return fetch_and_calculate(*args, **kwargs)
+
+    monkeypatch.setattr(data_fetcher, 'fetch_and_calculate', interrupt_after)
+    monkeypatch.setitem(data_fetcher._backends, 'quotes', CountingQuotes())
+    with pytest.raises(KeyboardInterrupt):
+        data_fetcher.main(argv)
+
+    journaled = [json.loads(line) for line in _lines(journal_path)]
+    assert [entry['symbol'] for entry in journaled] == calls
+    # Kesilen çalıştırma hiçbir şey yayınlamadı
+    assert not db.tables.get('bist_stocks') and not db.tables.get('bist_price_history')
+
+    # 2. çalıştırma: günlükteki semboller indirilmez ama yayınlanır
+    monkeypatch.setattr(data_fetcher, 'fetch_and_calculate', fetch_and_calculate)
+    quotes = CountingQuotes()
+    monkeypatch.setitem(data_fetcher._backends, 'quotes', quotes)
+    assert data_fetcher.main(argv) == 0
+
+    membership = data_fetcher.load_membership(as_of=data_fetcher.datetime.now())
+    total = len(data_fetcher.INDICES) + len(membership.symbols)
+    assert len(quotes.downloaded) == total - done
+    assert not set(quotes.downloaded) & set(calls)
+    assert len(db.tables['bist_indices']) == len(data_fetcher.INDICES)
+    assert len(db.tables['bist_stocks']) == len(membership.symbols)
+
+    # Günlükten gelen sembollerin bugünkü kapanışları ve Yahoo'dan tamamlanan referansları da yazıldı
+    session = data_fetcher.get_current_session(data_fetcher.datetime.now()).strftime('%Y-%m-%d')
+    history = {**db.tables['bist_index_history'], **db.tables['bist_price_history']}
+    for entry in journaled:
+        symbol = data_fetcher.clean_symbol(entry['symbol'])
+        assert history[(symbol, session)]['close'] == entry['stats']['price']
+        for day, close in entry['stats']['fallback_history'].items():
+            assert history[(symbol, day)]['close'] == close
+    assert any(entry['stats']['fallback_history'] for entry in journaled)
+
+    # Her şey yayınlandı: günlük boşaltıldı
+    assert journal_path.read_text() == ''
@@ -0,0 +1,33 @@
+from datetime import date, datetime
+
+import pytest
+
+from trading_calendar import BIST_CALENDAR, CALENDAR_END, CALENDAR_START, KURBAN_BAYRAMI, RAMAZAN_BAYRAMI
+
+
+def test_range_is_limited_to_years_with_bayram_dates():
+    years = set(RAMAZAN_BAYRAMI) & set(KURBAN_BAYRAMI)
+    assert CALENDAR_START.year == min(years)
+    assert CALENDAR_END.year == max(years)
+
+
+def test_bayram_days_are_not_sessions():
+    for first_day in (RAMAZAN_BAYRAMI[2026], KURBAN_BAYRAMI[2026]):
+        assert not BIST_CALENDAR.is_session(first_day)
+
+
+def test_holiday_friday_falls_back_to_thursday():
+    # 2026 Kurban Bayramı 27-30 Mayıs: 1 Haziran Pazartesi için geçen haftanın son seansı 26 Mayıs
+    assert BIST_CALENDAR.last_session_of_previous_week(date(2026, 6, 1)) == date(2026, 5, 26)
+    assert BIST_CALENDAR.previous_session(datetime(2026, 6, 1, 11, 0)) == date(2026, 5, 26)
+
+
+@pytest.mark.parametrize('query', [
+    lambda cal: cal.is_session(date(CALENDAR_END.year + 1, 3, 1)),
+    lambda cal: cal.session_on_or_before(date(CALENDAR_END.year + 1, 3, 1)),
+    lambda cal: cal.previous_session(date(CALENDAR_START.year - 1, 6, 1)),
+    lambda cal: cal.next_session(CALENDAR_END),
+])
+def test_queries_outside_known_years_fail_loudly(query):
+    with pytest.raises(ValueError):
+        query(BIST_CALENDAR)
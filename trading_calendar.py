@@ -0,0 +1,144 @@
+"""
+BIST işlem takvimi.
+
+Hafta sonları ve resmi tatiller çıkarılarak seans günleri önceden hesaplanır ve
+sıralı bir dizi olarak tutulur. "Önceki seans" ve "geçen haftanın son seansı"
+gibi sorgular bu dizi üzerinde ikili arama ile O(log n) sürede cevaplanır.
+"""
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+# Pay piyasası seans saatleri (İstanbul saati): sürekli işlem + kapanış seansı
+SESSION_OPEN = time(10, 0)
+SESSION_CLOSE = time(18, 10)
+HALF_DAY_CLOSE = time(12, 40)
+
+# Her yıl aynı güne denk gelen resmi tatiller (ay, gün)
+FIXED_HOLIDAYS = [
+    (1, 1),    # Yılbaşı
+    (4, 23),   # Ulusal Egemenlik ve Çocuk Bayramı
+    (5, 1),    # Emek ve Dayanışma Günü
+    (5, 19),   # Atatürk'ü Anma, Gençlik ve Spor Bayramı
+    (7, 15),   # Demokrasi ve Milli Birlik Günü
+    (8, 30),   # Zafer Bayramı
+    (10, 29),  # Cumhuriyet Bayramı
+]
+
+# Dini bayramların ilk günleri (arife bir önceki gün, yarım gün)
+RAMAZAN_BAYRAMI = {
+    2020: date(2020, 5, 24), 2021: date(2021, 5, 13), 2022: date(2022, 5, 2),
+    2023: date(2023, 4, 21), 2024: date(2024, 4, 10), 2025: date(2025, 3, 30),
+    2026: date(2026, 3, 20), 2027: date(2027, 3, 9),
+}
+KURBAN_BAYRAMI = {
+    2020: date(2020, 7, 31), 2021: date(2021, 7, 20), 2022: date(2022, 7, 9),
+    2023: date(2023, 6, 28), 2024: date(2024, 6, 16), 2025: date(2025, 6, 6),
+    2026: date(2026, 5, 27), 2027: date(2027, 5, 16),
+}
+
+# Takvim yalnızca dini bayram tarihleri bilinen yılları kapsar; aralık dışındaki
+# sorgular bayramları seans sayacağı için hata verir. Yeni yıllar için yukarıdaki
+# tablolara o yılın bayram tarihleri eklenmeli.
+_BAYRAM_YEARS = sorted(set(RAMAZAN_BAYRAMI) & set(KURBAN_BAYRAMI))
+CALENDAR_START = date(_BAYRAM_YEARS[0], 1, 1)
+CALENDAR_END = date(_BAYRAM_YEARS[-1], 12, 31)
+
+
+def _build_holidays():
+    holidays = set()
+    half_days = set()
+    for year in range(CALENDAR_START.year, CALENDAR_END.year + 1):
+        for month, day in FIXED_HOLIDAYS:
+            holidays.add(date(year, month, day))
+        # 28 Ekim öğleden sonra kapalı
+        half_days.add(date(year, 10, 28))
+
+    for first_days, length in ((RAMAZAN_BAYRAMI, 3), (KURBAN_BAYRAMI, 4)):
+        for first_day in first_days.values():
+            holidays.update(first_day + timedelta(days=i) for i in range(length))
+            half_days.add(first_day - timedelta(days=1))
+
+    return holidays, half_days - holidays
+
+
+HOLIDAYS, HALF_DAYS = _build_holidays()
+
+
+def _to_day(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return np.datetime64(value, 'D')
+
+
+class TradingCalendar:
+    def __init__(self, start=CALENDAR_START, end=CALENDAR_END, holidays=HOLIDAYS, half_days=HALF_DAYS):
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+        holiday_arr = np.array(sorted(holidays), dtype='datetime64[D]')
+        self.sessions = days[np.is_busday(days, holidays=holiday_arr)]
+        self.half_days = frozenset(half_days)
+        self.start = np.datetime64(start, 'D')
+        self.end = np.datetime64(end, 'D')
+
+    def _day(self, day):
+        d = _to_day(day)
+        if d < self.start or d > self.end:
+            raise ValueError(f"{day} is outside the trading calendar range ({self.start} - {self.end}); "
+                             f"add that year's bayram dates to trading_calendar.py")
+        return d
+
+    def _session_at(self, idx, day):
+        if idx < 0 or idx >= len(self.sessions):
+            raise ValueError(f"{day} has no session inside the trading calendar range ({self.start} - {self.end})")
+        return self.sessions[idx].astype(date)
+
+    def is_session(self, day):
+        d = self._day(day)
+        idx = np.searchsorted(self.sessions, d)
+        return idx < len(self.sessions) and self.sessions[idx] == d
+
+    def session_on_or_before(self, day):
+        """
+        Verilen gün seanssa kendisini, değilse ondan önceki son seansı döner.
+        """
+        idx = np.searchsorted(self.sessions, self._day(day), side='right') - 1
+        return self._session_at(idx, day)
+
+    def previous_session(self, day):
+        """
+        Verilen günden kesinlikle önceki son seansı döner.
+        """
+        idx = np.searchsorted(self.sessions, self._day(day), side='left') - 1
+        return self._session_at(idx, day)
+
+    def next_session(self, day):
+        """
+        Verilen günden kesinlikle sonraki ilk seansı döner.
+        """
+        idx = np.searchsorted(self.sessions, self._day(day), side='right')
+        return self._session_at(idx, day)
+
+    def session_hours(self, day):
+        """
+        Seansın (açılış, kapanış) zamanlarını datetime olarak döner; gün seans değilse None.
+        Yarım günlerde kapanış HALF_DAY_CLOSE'dur.
+        """
+        if isinstance(day, datetime):
+            day = day.date()
+        if not self.is_session(day):
+            return None
+        close = HALF_DAY_CLOSE if day in self.half_days else SESSION_CLOSE
+        return datetime.combine(day, SESSION_OPEN), datetime.combine(day, close)
+
+    def last_session_of_previous_week(self, day):
+        """
+        Verilen günün haftasından (Pzt-Paz) önceki haftanın son seansını döner.
+        Cuma tatilse Perşembe, bütün hafta tatilse daha önceki hafta gelir.
+        """
+        if isinstance(day, datetime):
+            day = day.date()
+        monday = day - timedelta(days=day.weekday())
+        return self.previous_session(monday)
+
+
+BIST_CALENDAR = TradingCalendar()